@@ -20,8 +20,11 @@
 #   the context of a single operator e.g. "berry"
 #
 # Doc refers to the object that is passed to the compiled filter function
+#
+# Leaf refers to a value found at the end of a path in a doc, which an operator
+#   tests with its `_leaf_*` function, e.g. "berry" in { "fruits": [{ "type": "berry" }] }
 
-from typing import List
+from typing import List, Optional
 
 from .operators.and_or_nor import _match_and, _match_or, _match_nor, _validate_query_ops
 from .operators.all import _match_all, _validate_all
@@ -35,6 +38,12 @@ from .operators.lte import _match_lte
 from .operators.mod import _match_mod, _validate_mod
 from .operators.regex import _match_regex
 from .operators.size import _match_size, _validate_size
+from .path import _compile_path
+from .compiler import Predicate, _Compiler
+from .codegen import _codegen_query
+from .normalize import _normalize, _Normalizer
+from .prepared import Param, PreparedQuery
+from . import cache
 
 cond_ops = {
     "$eq",
@@ -62,12 +71,159 @@ query_ops = {
 
 
 class Query:
-    def __init__(self, query):
+    def __init__(
+        self,
+        query,
+        *,
+        codegen: bool = False,
+        reorder: bool = True,
+        adaptive: bool = False,
+        normalize: bool = True,
+        strict: bool = False,
+    ):
+        if codegen and adaptive:
+            raise ValueError("adaptive is not supported with codegen")
+
         self._query = query
-        pass
+        self._codegen = codegen
+        self._reorder = reorder
+        self._adaptive = adaptive
+        self._normalize = normalize
+        self._strict = strict
+        self.compile()
+
+    @classmethod
+    def cached(
+        cls,
+        query,
+        *,
+        codegen: bool = False,
+        reorder: bool = True,
+        adaptive: bool = False,
+        normalize: bool = True,
+        strict: bool = False,
+    ) -> "Query":
+        """
+        A compiled `Query` for *query*, shared with earlier calls for the same
+        query (see `mgqpy.cache.canonical`) and options, from a process-wide
+        least-recently-used cache. A copy of the query is compiled, so mutating
+        it afterwards does not affect the cached predicate.
+
+        The cache can be resized with `mgqpy.cache.cache_queries`, and
+        `mgqpy.cache.query_cache_info` reports its hits, misses and evictions.
+        """
+
+        options = dict(
+            codegen=codegen,
+            reorder=reorder,
+            adaptive=adaptive,
+            normalize=normalize,
+            strict=strict,
+        )
+        return cache._cache.get(cls, query, options)
+
+    @staticmethod
+    def prepare(template, *, reorder: bool = True, strict: bool = False):
+        """
+        A `PreparedQuery` for *template*, a query with `Param` placeholders for
+        operator values, e.g. {"foo": {"$gt": Param("min")}}. The template is
+        generated once (see `codegen`), `bind` then only prepares the values.
+        Templates are not normalized.
+        """
+
+        return PreparedQuery(template, reorder=reorder, strict=strict)
 
     def test(self, doc) -> bool:
-        return _match_cond(self._query, doc)
+        return self._predicate(doc)
+
+    def compile(self):
+        """
+        Build the predicate used by `test` from the query.
+        This is done on init, call it again if the query has been mutated since.
+
+        Conditions of implicit and explicit $and are evaluated cheapest first,
+        pass `reorder=False` on init to keep the order of the query instead.
+
+        With `adaptive=True` on init, branches of $and, $or and $nor are
+        periodically reordered at runtime from the outcomes seen so far,
+        see `stats`. Compiling again resets the statistics.
+
+        The query is first rewritten into an equivalent one that is cheaper to
+        evaluate (see `normalized`), with conditions that never or always match
+        folded into constants (see `folded` and `constant`), pass
+        `normalize=False` on init to compile it as it is.
+
+        Operator values are validated once here: invalid ones ($in that is not
+        a list, ...) never match. With `strict=True` on init they raise
+        TypeError instead, like `validate`.
+        """
+
+        if self._strict:
+            # before normalizing, which drops branches that cannot matter
+            _validate(self._query)
+        self._folds: List[dict] = []
+        query = self._query
+        if self._normalize:
+            normalizer = _Normalizer(strict=self._strict)
+            query = normalizer.query(query)
+            self._folds = normalizer.folds
+        self._constant = _constant(query)
+
+        self.source: Optional[str] = None
+        self._adaptive_nodes = []
+        if self._codegen:
+            self._predicate, self.source = _codegen_query(
+                query, reorder=self._reorder, strict=self._strict
+            )
+        else:
+            compiler = _Compiler(
+                reorder=self._reorder, adaptive=self._adaptive, strict=self._strict
+            )
+            self._predicate = compiler.query(query)
+            self._adaptive_nodes = compiler.adaptive_nodes
+        return self
+
+    def normalized(self):
+        """
+        The query rewritten into an equivalent query that is cheaper to evaluate:
+        nested $and are flattened, conditions on the same path merged into one
+        expression and duplicates dropped, $or of equalities on the same path
+        turned into $in, $not and $nor of equalities and $in into $ne and
+        $nin, and conditions that never or always match folded into {"$or": []}
+        and {} (see `folded`). The query itself is left unchanged.
+        """
+
+        return _normalize(self._query)
+
+    def folded(self) -> List[dict]:
+        """
+        Parts of the query replaced by a constant when compiling, as they never
+        or always match whatever the document: for each, the query that was
+        folded, its result and the reason, e.g. $in without values.
+        Conditions on the same path are only folded when they contradict each
+        other for arrays too, {"a": {"$gt": 5, "$lt": 1}} matches {"a": [6, 0]}.
+        """
+
+        return list(self._folds)
+
+    def constant(self) -> Optional[bool]:
+        """
+        False if the query never matches and True if it always matches,
+        whatever the document, as found when compiling (see `folded`).
+        None otherwise.
+        """
+
+        return self._constant
+
+    def stats(self) -> List[dict]:
+        """
+        Statistics of the branches of each $and, $or and $nor of an adaptive query:
+        the current evaluation order and, for each branch, its query, static cost,
+        how often it was evaluated and how often it was decisive (a failing
+        $and branch or a matching $or/$nor branch).
+        """
+
+        return [node.stats() for node in self._adaptive_nodes]
 
     def validate(self):
         _validate(self._query)
@@ -75,62 +231,62 @@ class Query:
 
 
 def _match_cond(query, doc):
-    results: List[bool] = []
-
     for path in query:
         if isinstance(path, str) and path in query_ops:
-            if path == "$and":
-                results.append(_match_and(doc, path, query["$and"]))
-            if path == "$or":
-                results.append(_match_or(doc, path, query["$or"]))
-            if path == "$nor":
-                results.append(_match_nor(doc, path, query["$nor"]))
+            if path == "$and" and not _match_and(doc, path, query["$and"]):
+                return False
+            if path == "$or" and not _match_or(doc, path, query["$or"]):
+                return False
+            if path == "$nor" and not _match_nor(doc, path, query["$nor"]):
+                return False
         else:
             exp_or_ov = query[path]
             is_all_exp = _check_all_exp(exp_or_ov)
-            path_parts = path.split(".")
+            path_parts = _compile_path(path)
 
             if is_all_exp:
                 exp = exp_or_ov
-                if "$eq" in exp:
-                    results.append(_match_eq(doc, path_parts, exp["$eq"]))
-                if "$ne" in exp:
-                    results.append(_match_ne(doc, path_parts, exp["$ne"]))
-                if "$gt" in exp:
-                    results.append(_match_gt(doc, path_parts, exp["$gt"]))
-                if "$gte" in exp:
-                    results.append(_match_gte(doc, path_parts, exp["$gte"]))
-                if "$lt" in exp:
-                    results.append(_match_lt(doc, path_parts, exp["$lt"]))
-                if "$lte" in exp:
-                    results.append(_match_lte(doc, path_parts, exp["$lte"]))
-                if "$in" in exp:
-                    results.append(_match_in(doc, path_parts, exp["$in"]))
-                if "$nin" in exp:
-                    results.append(_match_nin(doc, path_parts, exp["$nin"]))
-                if "$not" in exp:
-                    results.append(_match_not(doc, path, exp["$not"]))
+                if "$eq" in exp and not _match_eq(doc, path_parts, exp["$eq"]):
+                    return False
+                if "$ne" in exp and not _match_ne(doc, path_parts, exp["$ne"]):
+                    return False
+                if "$gt" in exp and not _match_gt(doc, path_parts, exp["$gt"]):
+                    return False
+                if "$gte" in exp and not _match_gte(doc, path_parts, exp["$gte"]):
+                    return False
+                if "$lt" in exp and not _match_lt(doc, path_parts, exp["$lt"]):
+                    return False
+                if "$lte" in exp and not _match_lte(doc, path_parts, exp["$lte"]):
+                    return False
+                if "$in" in exp and not _match_in(doc, path_parts, exp["$in"]):
+                    return False
+                if "$nin" in exp and not _match_nin(doc, path_parts, exp["$nin"]):
+                    return False
+                if "$not" in exp and not _match_not(doc, path, exp["$not"]):
+                    return False
                 if "$regex" in exp:
                     ov = {
                         "$regex": exp["$regex"],
                         "$options": exp.get("$options", ""),
                     }
-                    results.append(_match_regex(doc, path_parts, ov))
-                if "$mod" in exp:
-                    results.append(_match_mod(doc, path_parts, exp["$mod"]))
-                if "$all" in exp:
-                    results.append(_match_all(doc, path_parts, exp["$all"]))
-                if "$elemMatch" in exp:
-                    results.append(
-                        _match_elem_match(doc, path_parts, exp["$elemMatch"])
-                    )
-                if "$size" in exp:
-                    results.append(_match_size(doc, path_parts, exp["$size"]))
+                    if not _match_regex(doc, path_parts, ov):
+                        return False
+                if "$mod" in exp and not _match_mod(doc, path_parts, exp["$mod"]):
+                    return False
+                if "$all" in exp and not _match_all(doc, path_parts, exp["$all"]):
+                    return False
+                if "$elemMatch" in exp and not _match_elem_match(
+                    doc, path_parts, exp["$elemMatch"]
+                ):
+                    return False
+                if "$size" in exp and not _match_size(doc, path_parts, exp["$size"]):
+                    return False
             else:
                 ov = exp_or_ov
-                results.append(_match_eq(doc, path_parts, ov))
+                if not _match_eq(doc, path_parts, ov):
+                    return False
 
-    return all(results)
+    return True
 
 
 def _validate(query) -> bool:
@@ -169,9 +325,19 @@ def _validate(query) -> bool:
     return True
 
 
+def _constant(query) -> Optional[bool]:
+    if query == {}:
+        return True
+    if query == {"$or": []}:
+        return False
+    return None
+
+
 def _check_all_exp(exp_or_ov):
-    return (
-        exp_or_ov
-        and isinstance(exp_or_ov, dict)
-        and all(key in cond_ops for key in exp_or_ov.keys())
-    )
+    if not exp_or_ov or not isinstance(exp_or_ov, dict):
+        return False
+
+    for key in exp_or_ov:
+        if key not in cond_ops:
+            return False
+    return True
@@ -0,0 +1,183 @@
+# Canonical serialization of queries, and a cache of compiled queries keyed by it.
+#
+# Two queries have the same serialization when they are written the same,
+# except for the order of the operators within an expression, which never
+# changes what an expression matches ({"$gt": 1, "$lt": 5} is
+# {"$lt": 5, "$gt": 1}). The order of the conditions of a query is kept, as it
+# is the evaluation order with `reorder=False`, and so is the order of keys in
+# values, which dict comparisons depend on.
+#
+# Values are tagged with their type, since 1, 1.0 and True match different
+# documents. Values of other types than those listed in _reprs and _value
+# cannot be serialized, queries with them are compiled without the cache.
+
+import copy
+import datetime
+import decimal
+import hashlib
+import json
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, NamedTuple, Sequence
+
+import mgqpy
+
+# values serialized by their repr, which identifies them
+_reprs = {
+    datetime.datetime: "datetime",
+    datetime.date: "date",
+    datetime.time: "time",
+    datetime.timedelta: "timedelta",
+    decimal.Decimal: "decimal",
+    uuid.UUID: "uuid",
+}
+
+
+def canonical(query) -> str:
+    """
+    Canonical serialization of *query*, the same for queries that only differ
+    in the order of the operators of their expressions.
+    Raises TypeError for values of types that cannot be serialized.
+    """
+
+    return json.dumps(_query(query), separators=(",", ":"))
+
+
+def fingerprint(query) -> str:
+    """Stable SHA-256 hex digest of the `canonical` serialization of *query*."""
+
+    return hashlib.sha256(canonical(query).encode()).hexdigest()
+
+
+def _query(query) -> Any:
+    if not isinstance(query, dict):
+        return _value(query)
+
+    conds = []
+    for path, value in query.items():
+        if path in mgqpy.query_ops and isinstance(value, list):
+            conds.append([path, [_query(cond) for cond in value]])
+        else:
+            conds.append([_value(path), _exp_or_ov(value)])
+    return ["query", conds]
+
+
+def _exp_or_ov(exp_or_ov) -> Any:
+    if not mgqpy._check_all_exp(exp_or_ov):
+        return _value(exp_or_ov)
+
+    ops = []
+    for op in sorted(exp_or_ov):
+        ov = exp_or_ov[op]
+        if op == "$not":
+            ops.append([op, _exp_or_ov(ov)])
+        elif op == "$elemMatch":
+            ops.append([op, _query(ov)])
+        else:
+            ops.append([op, _value(ov)])
+    return ["exp", ops]
+
+
+def _value(value) -> Any:
+    if value is None or type(value) in (bool, int, str):
+        return [type(value).__name__, value]
+    if type(value) is float:
+        # json has no nan or infinity, and tells 1.0 apart from 1 only by type
+        return ["float", repr(value)]
+    if type(value) in (list, tuple):
+        return [type(value).__name__, [_value(v) for v in value]]
+    if type(value) is dict:
+        return ["dict", [[_value(k), _value(v)] for k, v in value.items()]]
+    if isinstance(value, re.Pattern):
+        return ["pattern", repr(value.pattern), value.flags]
+    if type(value) in _reprs:
+        return [_reprs[type(value)], repr(value)]
+    raise TypeError(f"cannot serialize {type(value).__name__} values in queries")
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class _QueryCache:
+    """Least-recently-used cache of compiled queries, safe to share between threads."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.queries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, cls, query, options: dict):
+        try:
+            key = (canonical(query), *options.values())
+        except TypeError:
+            key = None
+
+        with self.lock:
+            compiled = self.queries.get(key)
+            if compiled is not None:
+                self.queries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        if key is None or not self.maxsize:
+            return cls(query, **options)
+
+        # compiled outside of the lock, a copy so that the cached predicate does
+        # not change if the caller mutates the query afterwards
+        compiled = cls(copy.deepcopy(query), **options)
+
+        with self.lock:
+            if key in self.queries:
+                # compiled by another thread meanwhile
+                self.queries.move_to_end(key)
+                return self.queries[key]
+            self.queries[key] = compiled
+            if len(self.queries) > self.maxsize:
+                self.queries.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions, self.maxsize, len(self.queries)
+            )
+
+
+_cache = _QueryCache(1024)
+
+
+def cache_queries(maxsize: int = 1024) -> None:
+    """Resize the cache of `Query.cached`, clearing it and its counters.
+
+    A *maxsize* of 0 disables the cache, `Query.cached` then always compiles.
+    """
+
+    global _cache
+    _cache = _QueryCache(maxsize)
+
+
+def query_cache_info() -> CacheInfo:
+    """Hits, misses, evictions and size of the cache of `Query.cached`."""
+
+    return _cache.info()
+
+
+__all__: Sequence[str] = (
+    "canonical",
+    "fingerprint",
+    "cache_queries",
+    "query_cache_info",
+    "CacheInfo",
+)
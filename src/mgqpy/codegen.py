@@ -0,0 +1,432 @@
+# Compiles a query into the source of a single Python function.
+#
+# Every condition becomes one boolean expression. Path lookups through dicts
+# are inlined as nested conditional expressions, and leaves with plain int,
+# float or str values are compared inline. Whenever the document does not
+# have the expected shape (lists, missing fields, other types) the expression
+# defers to the path expression of the condition (see mgqpy.path) for the rest
+# of the path, or to the operator's leaf test, so results are the same as the
+# interpreter's.
+#
+# Queries or sub-queries that cannot be generated defer to the interpreter.
+
+import linecache
+import math
+import re
+from itertools import count
+from typing import Any, Dict, List, Tuple, TypeVar
+
+import mgqpy
+
+from .compiler import (
+    Predicate,
+    _check_query_ops,
+    _Compiler,
+    _expression,
+    _intervals,
+    _path_ops,
+)
+from .cost import _cost_cond, _cost_op, _cost_query, _cost_query_op
+from .operators.all import (
+    _all_elem_match_query,
+    _is_all_elem_match,
+    _leaf_all,
+    _leaf_all_set,
+)
+from .operators.elem_match import _leaf_elem_match_compiled
+from .operators.eq_ne_not import _leaf_eq, _leaf_eq_coerced
+from .operators.gt import _leaf_gt, _leaf_gt_coerced, _leaf_gt_number
+from .operators.gte import _leaf_gte, _leaf_gte_coerced, _leaf_gte_number
+from .operators.in_nin import _leaf_in, _leaf_in_set
+from .operators.interval import _leaf_interval
+from .operators.lt import _leaf_lt, _leaf_lt_coerced, _leaf_lt_number
+from .operators.lte import _leaf_lte, _leaf_lte_coerced, _leaf_lte_number
+from .operators.mod import _leaf_mod, _leaf_mod_floored
+from .operators.regex import _leaf_literal, _leaf_regex, _leaf_search
+from .operators.size import _leaf_size, _leaf_size_int
+from .path import _compile_path, _Op, _Path, _PathExpression
+from .utils import _Coerced
+
+_MISSING = object()
+
+_filenames = count()
+
+_runtime = {
+    "_MISSING": _MISSING,
+    "_match_cond": lambda query, doc: mgqpy._match_cond(query, doc),
+    "_leaf_all": _leaf_all,
+    "_leaf_all_set": _leaf_all_set,
+    "_leaf_elem_match_compiled": _leaf_elem_match_compiled,
+    "_leaf_eq": _leaf_eq,
+    "_leaf_eq_coerced": _leaf_eq_coerced,
+    "_leaf_gt": _leaf_gt,
+    "_leaf_gt_coerced": _leaf_gt_coerced,
+    "_leaf_gt_number": _leaf_gt_number,
+    "_leaf_gte": _leaf_gte,
+    "_leaf_gte_coerced": _leaf_gte_coerced,
+    "_leaf_gte_number": _leaf_gte_number,
+    "_leaf_in": _leaf_in,
+    "_leaf_in_set": _leaf_in_set,
+    "_leaf_interval": _leaf_interval,
+    "_leaf_lt": _leaf_lt,
+    "_leaf_lt_coerced": _leaf_lt_coerced,
+    "_leaf_lt_number": _leaf_lt_number,
+    "_leaf_lte": _leaf_lte,
+    "_leaf_lte_coerced": _leaf_lte_coerced,
+    "_leaf_lte_number": _leaf_lte_number,
+    "_leaf_mod": _leaf_mod,
+    "_leaf_mod_floored": _leaf_mod_floored,
+    "_leaf_regex": _leaf_regex,
+    "_leaf_search": _leaf_search,
+    "_leaf_literal": _leaf_literal,
+    "_leaf_size": _leaf_size,
+    "_leaf_size_int": _leaf_size_int,
+}
+
+T = TypeVar("T")
+
+# negated operators are generated as the negation of these
+_positive = {
+    "$ne": "$eq",
+    "$nin": "$in",
+}
+
+_comparisons = {
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+
+
+def _codegen_query(
+    query, *, reorder: bool = True, strict: bool = False
+) -> Tuple[Predicate, str]:
+    """Generate, compile and return the predicate for *query* and its source."""
+
+    gen = _Generator(reorder=reorder, strict=strict)
+    source = gen.function(query)
+    return _exec(source, gen.consts), source
+
+
+def _exec(source: str, consts: Dict[str, Any]) -> Predicate:
+    """Compile the generated source, with *consts* in its namespace."""
+
+    filename = f"<mgqpy-query-{next(_filenames)}>"
+
+    # register the source so that tracebacks and debuggers can show it
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+    namespace = dict(_runtime, **consts)
+    exec(compile(source, filename, "exec"), namespace)
+    return namespace["_predicate"]
+
+
+class _Placeholder:
+    """
+    Operator value of a placeholder (see mgqpy.prepared), by the names its
+    leaf test and prepared value are bound to in the predicate's namespace.
+    """
+
+    def __init__(self, i: int):
+        self.leaf = f"_t{i}"
+        self.value = f"_p{i}"
+
+
+class _Generator:
+    def __init__(self, *, reorder: bool = True, strict: bool = False):
+        # run cheaper conditions of a conjunction first (see mgqpy.cost)
+        self.reorder = reorder
+        # raise on invalid operator values instead of never matching them
+        self.strict = strict
+        self.consts: Dict[str, Any] = {}
+        self.names: Dict[Any, str] = {}
+        # compiles the operators tested on leaves, e.g. $elemMatch sub-queries
+        self.compiler = _Compiler(reorder=reorder, strict=strict)
+        # (op, Param) of each placeholder, bound to _t{i} and _p{i}
+        self.placeholders: List[Tuple[str, Any]] = []
+        # (name, path, ops) of the path expressions with placeholders, built
+        # once they are bound
+        self.expressions: List[Tuple[str, _Path, List[_Op]]] = []
+
+    def const(self, value) -> str:
+        key = id(value)
+        if key not in self.names:
+            self.names[key] = f"_c{len(self.consts)}"
+            self.consts[self.names[key]] = value
+        return self.names[key]
+
+    def order(self, terms: List[Tuple[int, T]]) -> List[T]:
+        if self.reorder:
+            terms = sorted(terms, key=lambda term: term[0])
+        return [term for _, term in terms]
+
+    def literal(self, value) -> str:
+        """Inline simple literals to keep the generated source readable."""
+
+        if value is None or type(value) in (int, str):
+            return repr(value)
+        if type(value) is float and math.isfinite(value):
+            return repr(value)
+        return self.const(value)
+
+    def function(self, query) -> str:
+        lines = ["def _predicate(doc):"]
+
+        if not isinstance(query, dict) or not query:
+            lines.append(f"    return {self.query(query)}")
+            return "\n".join(lines) + "\n"
+
+        conds = self.order([(_cost_query({p: v}), (p, v)) for p, v in query.items()])
+
+        lines.append("    return (")
+        for i, (path, value) in enumerate(conds):
+            prefix = "        " if i == 0 else "        and "
+            lines.append(f"        # {_describe(path, value)}")
+            lines.append(f"{prefix}{self.query({path: value})}")
+        lines.append("    )")
+        return "\n".join(lines) + "\n"
+
+    def query(self, query) -> str:
+        if not isinstance(query, dict):
+            if self.strict:
+                raise TypeError("query must be a dict")
+            return self.interpret(query)
+
+        terms: List[Tuple[int, str]] = []
+        for path in query:
+            if not isinstance(path, str):
+                return self.interpret(query)
+
+            if path in mgqpy.query_ops:
+                cost = _cost_query_op(path, query[path])
+                terms.append((cost, self.query_op(path, query[path])))
+            else:
+                cost = _cost_cond(path, query[path])
+                terms.append((cost, self.cond(path, query[path])))
+
+        return _and(self.order(terms))
+
+    def query_op(self, op: str, ov) -> str:
+        if not _check_query_ops(op, ov, self.strict):
+            return "False"
+
+        if op == "$and":
+            return _and(self.order([(_cost_query(c), self.query(c)) for c in ov]))
+
+        terms = [self.query(cond) for cond in ov]
+
+        if op == "$or":
+            return _or(terms)
+        return f"(not {_or(terms)})"
+
+    def interpret(self, query) -> str:
+        return f"_match_cond({self.const(query)}, doc)"
+
+    def cond(self, path: str, exp_or_ov) -> str:
+        parsed = _compile_path(path)
+
+        if not mgqpy._check_all_exp(exp_or_ov):
+            return self.walk(parsed, [("$eq", exp_or_ov)])
+
+        ops = _expression(exp_or_ov, strict=self.strict)
+        if ops is None:
+            return "False"
+
+        terms: List[Tuple[int, str]] = []
+        path_ops: List[Tuple[int, Tuple[str, Any]]] = []
+
+        for op, ov in ops:
+            cost = _cost_op(path, op, exp_or_ov[op])
+            if op == "$not":
+                terms.append((cost, f"(not {self.query({path: ov})})"))
+            elif op == "$all" and _is_all_elem_match_query(ov):
+                terms.append((cost, self.query(_all_elem_match_query(path, ov))))
+            else:
+                path_ops.append((cost, (op, ov)))
+
+        if path_ops:
+            path_ops = _intervals(path_ops)
+            cost = sum(cost for cost, _ in path_ops)
+            walk = self.walk(parsed, self.order(path_ops))
+            terms.insert(0, (cost, walk))
+
+        return _and(self.order(terms))
+
+    def walk(self, path: _Path, ops: List[Tuple[str, Any]]) -> str:
+        """
+        Look up the path through dicts and test the operators on the leaf.
+        A document of any other shape is matched by a path expression from
+        where the lookups stopped (see mgqpy.path).
+        """
+
+        path_ops = [(op, *self.path_op(op, ov)) for op, ov in ops]
+        expr_ops = [path_op[1:] for path_op in path_ops]
+
+        if any(isinstance(ov, _Placeholder) for _, ov, _ in expr_ops):
+            name = f"_e{len(self.expressions)}"
+            self.expressions.append((name, path, expr_ops))
+            return self.lookup(path, path_ops, name, 0)
+
+        expr = self.const(_PathExpression(path, expr_ops))
+        return self.lookup(path, path_ops, expr, 0)
+
+    def path_op(self, op: str, ov) -> _Op:
+        if isinstance(ov, mgqpy.Param):
+            negated = _path_ops[op][1]
+            self.placeholders.append((op, ov))
+            return (None, _Placeholder(len(self.placeholders) - 1), negated)
+        return self.compiler.path_op(op, ov)
+
+    def lookup(self, path: _Path, ops, expr: str, i: int) -> str:
+        var = _var(i)
+
+        if i == len(path):
+            return _and([self.leaf(*path_op, var) for path_op in ops])
+
+        key = path.keys[i]
+        found = f"({_var(i + 1)} := {var}.get({key!r}, _MISSING)) is not _MISSING"
+
+        return (
+            f"({self.lookup(path, ops, expr, i + 1)} "
+            f"if type({var}) is dict and {found} "
+            f"else {expr}.match({var}, {i}))"
+        )
+
+    def leaf(self, op: str, leaf, ov, negated: bool, var: str) -> str:
+        test = self.test(_positive.get(op, op), leaf, ov, var)
+        return f"(not {test})" if negated else test
+
+    def test(self, op: str, leaf, ov, var: str) -> str:
+        if isinstance(ov, _Placeholder):
+            return f"{ov.leaf}({var}, {ov.value})"
+
+        fallback = f"{leaf.__name__}({var}, {self.const(ov)})"
+        # values coerced when compiling are inlined as the original value
+        if isinstance(ov, _Coerced):
+            ov = ov.value
+
+        if op == "$eq":
+            if type(ov) in (int, float):
+                return (
+                    f"({var} == {self.literal(ov)} "
+                    f"if type({var}) is int or type({var}) is float "
+                    f"else {fallback})"
+                )
+            if type(ov) is str:
+                return (
+                    f"({var} == {self.literal(ov)} "
+                    f"if type({var}) is str "
+                    f"else {fallback})"
+                )
+            if ov is None:
+                return f"({var} is None or {fallback})"
+            if isinstance(ov, re.Pattern):
+                return (
+                    f"({self.const(ov)}.search({var}) is not None "
+                    f"if type({var}) is str "
+                    f"else {fallback})"
+                )
+            return fallback
+
+        if op in _comparisons:
+            cmp = _comparisons[op]
+            if type(ov) in (int, float):
+                return (
+                    f"({var} {cmp} {self.literal(ov)} "
+                    f"if type({var}) is int or type({var}) is float "
+                    f"else {fallback})"
+                )
+            if type(ov) is str:
+                return (
+                    f"({var} {cmp} {self.literal(ov)} "
+                    f"if type({var}) is str "
+                    f"else {fallback})"
+                )
+            return fallback
+
+        if op == "$interval" and not ov.numbers:
+            return _and([self.test(op, leaf, o, var) for op, leaf, o in ov.ops])
+        if op == "$interval":
+            # a chained comparison, e.g. 1 < x <= 5
+            lower = upper = ""
+            if ov.has_lower:
+                cmp = "<=" if ov.lower_inclusive else "<"
+                lower = f"{self.literal(ov.lower)} {cmp} "
+            if ov.has_upper:
+                cmp = "<=" if ov.upper_inclusive else "<"
+                upper = f" {cmp} {self.literal(ov.upper)}"
+            return (
+                f"({lower}{var}{upper} "
+                f"if type({var}) is int or type({var}) is float "
+                f"else {fallback})"
+            )
+
+        if op == "$in" and not (ov.regexes or ov.others):
+            return (
+                f"({var} in {self.const(ov.plain)} "
+                f"if type({var}) is str or type({var}) is int "
+                f"else {fallback})"
+            )
+
+        if op == "$regex" and leaf is _leaf_search:
+            return (
+                f"({self.const(ov)}.search({var}) is not None "
+                f"if type({var}) is str "
+                f"else {fallback})"
+            )
+        if op == "$regex" and leaf is _leaf_literal:
+            return f"({self.const(ov)}({var}) if type({var}) is str else {fallback})"
+
+        if op == "$mod":
+            divisor, remainder = ov
+            if all(type(o) in (int, float) and math.isfinite(o) for o in ov):
+                return (
+                    f"({var} % {math.floor(divisor)} == {math.floor(remainder)} "
+                    f"if type({var}) is int "
+                    f"else {fallback})"
+                )
+            return fallback
+
+        if op == "$size":
+            try:
+                size = int(ov)
+            except (TypeError, ValueError, OverflowError):
+                return fallback
+            return f"(type({var}) is list and len({var}) == {size})"
+
+        return fallback
+
+
+def _is_all_elem_match_query(ov) -> bool:
+    return not isinstance(ov, mgqpy.Param) and _is_all_elem_match(ov)
+
+
+def _var(i: int) -> str:
+    return "doc" if i == 0 else f"_v{i}"
+
+
+def _and(terms: List[str]) -> str:
+    if "False" in terms:
+        return "False"
+    terms = [t for t in terms if t != "True"]
+    if not terms:
+        return "True"
+    if len(terms) == 1:
+        return terms[0]
+    return "(" + " and ".join(terms) + ")"
+
+
+def _or(terms: List[str]) -> str:
+    if "True" in terms:
+        return "True"
+    terms = [t for t in terms if t != "False"]
+    if not terms:
+        return "False"
+    if len(terms) == 1:
+        return terms[0]
+    return "(" + " or ".join(terms) + ")"
+
+
+def _describe(path, value) -> str:
+    return " ".join(f"{path}: {value!r}".splitlines())
@@ -0,0 +1,487 @@
+# Compiles a query into a tree of predicate closures.
+#
+# The interpreter (`mgqpy._match_cond`) re-inspects the query for every document:
+# it iterates the query dict, checks whether each value is an expression,
+# splits paths and dispatches on operator names. The compiler does all of that
+# once and returns a `Predicate`, a callable that only has to walk documents.
+#
+# Anything the compiler does not understand (e.g. a query that is not a dict)
+# is compiled to a closure that defers to the interpreter, so compiled and
+# interpreted queries always agree, including on errors raised at test time.
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import mgqpy
+
+from .cost import _cost_cond, _cost_op, _cost_query, _cost_query_op
+from .operators.all import (
+    _all_elem_match_query,
+    _is_all_elem_match,
+    _leaf_all,
+    _prepare_all,
+    _validate_all,
+)
+from .operators.and_or_nor import _validate_query_ops
+from .operators.elem_match import _leaf_elem_match_compiled
+from .operators.eq_ne_not import _leaf_eq, _prepare_eq
+from .operators.gt import _leaf_gt, _prepare_gt
+from .operators.gte import _leaf_gte, _prepare_gte
+from .operators.in_nin import _leaf_in, _prepare_in, _validate_in_nin
+from .operators.interval import _Interval, _leaf_interval
+from .operators.lt import _leaf_lt, _prepare_lt
+from .operators.lte import _leaf_lte, _prepare_lte
+from .operators.mod import _leaf_mod, _prepare_mod, _validate_mod
+from .operators.regex import _leaf_regex, _prepare_regex
+from .operators.size import _leaf_size, _prepare_size, _validate_size
+from .path import _compile_path, _Op, _PathExpression, _PathGroup
+
+Predicate = Callable[[Any], bool]
+
+T = TypeVar("T", bound=tuple)
+
+# (cost, predicate, query) of a branch of $and/$or/$nor
+_Branch = Tuple[int, Predicate, Any]
+
+
+# order in which the interpreter evaluates the operators of an expression
+_op_order = [
+    "$eq",
+    "$ne",
+    "$gt",
+    "$gte",
+    "$lt",
+    "$lte",
+    "$in",
+    "$nin",
+    "$not",
+    "$regex",
+    "$mod",
+    "$all",
+    "$elemMatch",
+    "$size",
+]
+
+_validators = {
+    "$in": _validate_in_nin,
+    "$nin": _validate_in_nin,
+    "$mod": _validate_mod,
+    "$all": _validate_all,
+    "$size": _validate_size,
+}
+
+_invalid = {
+    "$in": "$in operator value must be a list",
+    "$nin": "$nin operator value must be a list",
+    "$mod": "$mod operator value must be a list of 2 numbers",
+    "$all": "$all operator value must be a list",
+    "$size": "$size operator value must be a number",
+}
+
+_ranges = {"$gt", "$gte", "$lt", "$lte"}
+
+# operators that test the terminals of a path: leaf test, negated
+_path_ops = {
+    "$eq": (_leaf_eq, False),
+    "$ne": (_leaf_eq, True),
+    "$gt": (_leaf_gt, False),
+    "$gte": (_leaf_gte, False),
+    "$lt": (_leaf_lt, False),
+    "$lte": (_leaf_lte, False),
+    "$in": (_leaf_in, False),
+    "$nin": (_leaf_in, True),
+    "$regex": (_leaf_regex, False),
+    "$mod": (_leaf_mod, False),
+    "$all": (_leaf_all, False),
+    "$elemMatch": (_leaf_elem_match_compiled, False),
+    "$size": (_leaf_size, False),
+    # several range operators of an expression, see _intervals
+    "$interval": (_leaf_interval, False),
+}
+
+# operators whose value is prepared for the leaf test when compiling,
+# returning the leaf test and value to use
+_preparers = {
+    "$eq": _prepare_eq,
+    "$ne": _prepare_eq,
+    "$gt": _prepare_gt,
+    "$gte": _prepare_gte,
+    "$lt": _prepare_lt,
+    "$lte": _prepare_lte,
+    "$all": _prepare_all,
+    "$in": _prepare_in,
+    "$nin": _prepare_in,
+    "$regex": _prepare_regex,
+    "$mod": _prepare_mod,
+    "$size": _prepare_size,
+}
+
+# number of documents an adaptive conjunction or disjunction evaluates
+# between two reorderings of its branches
+_adapt_every = 1000
+
+
+class _Compiler:
+    def __init__(
+        self, *, reorder: bool = True, adaptive: bool = False, strict: bool = False
+    ):
+        # run cheaper conditions of a conjunction first (see mgqpy.cost)
+        self.reorder = reorder
+        # reorder branches of $and/$or/$nor from observed outcomes (see _Adaptive)
+        self.adaptive = adaptive
+        self.adaptive_nodes: List[_Adaptive] = []
+        # raise on invalid operator values instead of never matching them
+        self.strict = strict
+
+    def order(self, terms: List[T]) -> List[T]:
+        """Sort (cost, ...) terms cheapest first, unless reordering is disabled."""
+        if self.reorder:
+            terms = sorted(terms, key=lambda term: term[0])
+        return terms
+
+    def query(self, query) -> Predicate:
+        if not isinstance(query, dict):
+            if self.strict:
+                raise TypeError("query must be a dict")
+            return _interpret(query)
+
+        branches: List[_Branch] = []
+
+        for path in query:
+            if not isinstance(path, str):
+                return _interpret(query)
+
+            if path in mgqpy.query_ops:
+                cost = _cost_query_op(path, query[path])
+                pred = self.query_op(path, query[path])
+            else:
+                cost = _cost_cond(path, query[path])
+                pred = self.cond(path, query[path])
+
+            branches.append((cost, pred, {path: query[path]}))
+
+        return self.branches("$and", self.order(branches))
+
+    def query_op(self, op: str, ov) -> Predicate:
+        if not _check_query_ops(op, ov, self.strict):
+            return _false
+
+        branches = [(_cost_query(cond), self.query(cond), cond) for cond in ov]
+
+        if op == "$and":
+            return self.branches("$and", self.order(branches))
+        if op == "$or":
+            return self.branches("$or", branches)
+        return _negate(self.branches("$nor", branches))
+
+    def branches(self, op: str, branches: List[_Branch]) -> Predicate:
+        # look up paths shared by several branches once (see _share_prefixes)
+        branches = _share_prefixes(branches, op != "$and")
+
+        if self.adaptive and len(branches) > 1:
+            node = _Adaptive(op, branches)
+            self.adaptive_nodes.append(node)
+            return node
+
+        preds = [pred for _, pred, _ in branches]
+        if op == "$and":
+            return _all_of(preds)
+        return _any_of(preds)
+
+    def cond(self, path: str, exp_or_ov) -> Predicate:
+        parsed = _compile_path(path)
+
+        if not mgqpy._check_all_exp(exp_or_ov):
+            return _PathExpression(parsed, [self.path_op("$eq", exp_or_ov)])
+
+        ops = _expression(exp_or_ov, strict=self.strict)
+        if ops is None:
+            return _false
+
+        terms: List[Tuple[int, Predicate]] = []
+        ops_ovs: List[Tuple[int, Tuple[str, Any]]] = []
+
+        for op, ov in ops:
+            cost = _cost_op(path, op, exp_or_ov[op])
+            if op == "$not":
+                # the interpreter matches {path: ov} and negates it
+                terms.append((cost, _negate(self.cond(path, ov))))
+            elif op == "$all" and _is_all_elem_match(ov):
+                terms.append((cost, self.query(_all_elem_match_query(path, ov))))
+            else:
+                ops_ovs.append((cost, (op, ov)))
+
+        if ops_ovs:
+            # operators on the path share a single walk (see mgqpy.path)
+            path_ops = [
+                (cost, self.path_op(op, ov)) for cost, (op, ov) in _intervals(ops_ovs)
+            ]
+            path_ops = self.order(path_ops)
+            cost = sum(cost for cost, _ in path_ops)
+            pred = _PathExpression(parsed, [op for _, op in path_ops])
+            terms.insert(0, (cost, pred))
+
+        return _all_of([pred for _, pred in self.order(terms)])
+
+    def path_op(self, op: str, ov) -> _Op:
+        leaf, negated = _path_ops[op]
+        if op == "$elemMatch":
+            # tested against every element of an array
+            ov = self.query(ov)
+        elif op == "$interval":
+            # (op, ov) of each range operator, prepared as on their own
+            ov = _Interval([(o, *_preparers[o](v)) for o, v in ov])
+        elif op in _preparers:
+            leaf, ov = _preparers[op](ov)
+        return (leaf, ov, negated)
+
+
+def _expression(exp, *, strict: bool = False) -> Optional[List[Tuple[str, Any]]]:
+    """
+    Operators of an expression and their values, in the interpreter's order.
+    None if an operator value is invalid, as the expression can never match,
+    or a TypeError if *strict*.
+    """
+
+    ops: List[Tuple[str, Any]] = []
+
+    for op in _op_order:
+        if op not in exp:
+            continue
+
+        ov = exp[op]
+        if op == "$regex":
+            ov = {
+                "$regex": ov,
+                "$options": exp.get("$options", ""),
+            }
+        elif isinstance(ov, mgqpy.Param):
+            # validated when a value is bound (see mgqpy.prepared)
+            pass
+        elif op in _validators and not _validators[op](ov):
+            if strict:
+                raise TypeError(_invalid[op])
+            return None
+        elif op == "$all" and len(ov) == 0:
+            return None
+
+        ops.append((op, ov))
+
+    return ops
+
+
+def _intervals(
+    ops: List[Tuple[int, Tuple[str, Any]]],
+) -> List[Tuple[int, Tuple[str, Any]]]:
+    """
+    (cost, (op, ov)) of the operators on a path, with several range operators
+    merged into one $interval, tested on each leaf at once.
+    """
+
+    # values bound later to placeholders are tested on their own
+    ranges = [
+        term
+        for term in ops
+        if term[1][0] in _ranges and not isinstance(term[1][1], mgqpy.Param)
+    ]
+    if len(ranges) < 2:
+        return ops
+
+    # costs about as much as a single comparison, placed where the first range
+    # operator was to keep the interpreter's order
+    cost = max(cost for cost, _ in ranges)
+    interval = (cost, ("$interval", [op_ov for _, op_ov in ranges]))
+    merged = []
+    for term in ops:
+        if term is ranges[0]:
+            merged.append(interval)
+        elif not any(term is r for r in ranges):
+            merged.append(term)
+    return merged
+
+
+def _check_query_ops(op: str, ov, strict: bool) -> bool:
+    if _validate_query_ops(ov):
+        return True
+    if strict:
+        raise TypeError(f"{op} operator value must be a list")
+    return False
+
+
+class _Adaptive:
+    """
+    Branches of a conjunction ($and) or disjunction ($or, $nor) that are
+    reordered from the outcomes observed at runtime.
+
+    A branch is decisive when it ends the evaluation, i.e. a failing $and branch
+    or a matching $or/$nor branch ($nor is evaluated as a negated $or).
+    Every `_adapt_every` documents the branches are ranked by static cost over
+    their observed decisive rate, so the branch most likely to decide for the
+    least work runs first, and the counters are halved so that the order
+    follows a drifting stream.
+
+    Counters are plain ints updated without locking. Concurrent updates may be
+    lost, which only makes the statistics approximate. The order is a tuple that
+    is replaced in a single assignment, so a concurrent test always iterates a
+    complete order and results never depend on it.
+    """
+
+    def __init__(self, op: str, branches: List[_Branch]):
+        self.op = op
+        self.decides = op != "$and"
+        self.costs = [cost for cost, _, _ in branches]
+        self.preds = [pred for _, pred, _ in branches]
+        self.queries = [query for _, _, query in branches]
+        self.evaluated = [0] * len(branches)
+        self.decisive = [0] * len(branches)
+        self.order = tuple(range(len(branches)))
+        self.calls = 0
+
+    def __call__(self, doc) -> bool:
+        if self.calls >= _adapt_every:
+            self.adapt()
+        self.calls += 1
+
+        preds, evaluated, decisive = self.preds, self.evaluated, self.decisive
+        for i in self.order:
+            evaluated[i] += 1
+            if bool(preds[i](doc)) is self.decides:
+                decisive[i] += 1
+                return self.decides
+
+        return not self.decides
+
+    def adapt(self):
+        self.calls = 0
+        evaluated, decisive = self.evaluated, self.decisive
+
+        # smoothed decisive rate, so that branches never evaluated so far are
+        # still given a chance to move up
+        rank = [
+            (cost + 1) * (evaluated[i] + 2) / (decisive[i] + 1)
+            for i, cost in enumerate(self.costs)
+        ]
+        self.order = tuple(sorted(self.order, key=rank.__getitem__))
+
+        for i in range(len(evaluated)):
+            evaluated[i] //= 2
+            decisive[i] //= 2
+
+    def stats(self) -> dict:
+        return {
+            "op": self.op,
+            "order": list(self.order),
+            "branches": [
+                {
+                    "query": query,
+                    "cost": self.costs[i],
+                    "evaluated": self.evaluated[i],
+                    "decisive": self.decisive[i],
+                }
+                for i, query in enumerate(self.queries)
+            ],
+        }
+
+
+def _share_prefixes(
+    branches: List[_Branch], any_: bool, depth: int = 0
+) -> List[_Branch]:
+    """
+    Group the branches that walk a path (see mgqpy.path) by the field at
+    *depth* into a trie of `_PathGroup`s, so that every shared path prefix is
+    looked up once per document. A group takes the place of its first member.
+    """
+
+    groups: Dict[str, List[_Branch]] = {}
+    for branch in branches:
+        key = _prefix_key(branch[1], depth)
+        if key is not None:
+            groups.setdefault(key, []).append(branch)
+
+    shared: List[_Branch] = []
+    for branch in branches:
+        key = _prefix_key(branch[1], depth)
+        if key is None:
+            shared.append(branch)
+        elif key in groups:
+            group = groups.pop(key)
+            shared.append(_group(group, any_, depth) if len(group) > 1 else branch)
+
+    return shared
+
+
+def _prefix_key(pred: Predicate, depth: int) -> Optional[str]:
+    if isinstance(pred, (_PathExpression, _PathGroup)) and len(pred.path) > depth:
+        return pred.path.keys[depth]
+    return None
+
+
+def _group(branches: List[_Branch], any_: bool, depth: int) -> _Branch:
+    paths = [pred.path.keys for _, pred, _ in branches]
+
+    # longest prefix common to all members
+    n = depth + 1
+    while all(len(path) > n and path[n] == paths[0][n] for path in paths):
+        n += 1
+
+    members = _share_prefixes(branches, any_, n)
+    prefix = branches[0][1].path.prefix(n)
+    pred = _PathGroup(prefix, [pred for _, pred, _ in members], any_)
+    cost = sum(cost for cost, _, _ in branches)
+    query = {"$or" if any_ else "$and": [query for _, _, query in branches]}
+    return (cost, pred, query)
+
+
+def _all_of(preds: List[Predicate]) -> Predicate:
+    if len(preds) == 0:
+        return _true
+    if len(preds) == 1:
+        return preds[0]
+
+    def pred(doc):
+        for p in preds:
+            if not p(doc):
+                return False
+        return True
+
+    return pred
+
+
+def _any_of(preds: List[Predicate]) -> Predicate:
+    if len(preds) == 0:
+        return _false
+    if len(preds) == 1:
+        return preds[0]
+
+    def pred(doc):
+        for p in preds:
+            if p(doc):
+                return True
+        return False
+
+    return pred
+
+
+def _negate(p: Predicate) -> Predicate:
+    if isinstance(p, (_PathExpression, _PathGroup)):
+        # keeps the path of a negated predicate available for sharing
+        return _PathGroup(p.path, [p], True, negated=True)
+
+    def pred(doc):
+        return not p(doc)
+
+    return pred
+
+
+def _interpret(query) -> Predicate:
+    def pred(doc):
+        return mgqpy._match_cond(query, doc)
+
+    return pred
+
+
+def _true(doc) -> bool:
+    return True
+
+
+def _false(doc) -> bool:
+    return False
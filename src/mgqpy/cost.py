@@ -0,0 +1,89 @@
+# Static cost model used to order the conditions of a conjunction.
+#
+# Costs are relative units where looking up one field or comparing two plain
+# values costs 1. Each operator module estimates the cost of its own operator
+# (`_cost_*`), this module adds the cost of walking the path and of nested
+# queries. Operators that rarely decide a conjunction ($ne, $nin) are ranked
+# slightly more expensive so that selective checks on the same path run first.
+
+import mgqpy
+
+from .operators.all import _cost_all, _is_all_elem_match
+from .operators.and_or_nor import _cost_query_ops
+from .operators.elem_match import _cost_elem_match
+from .operators.eq_ne_not import _cost_eq, _cost_ne, _cost_not
+from .operators.gt import _cost_gt
+from .operators.gte import _cost_gte
+from .operators.in_nin import _cost_in, _cost_nin
+from .operators.lt import _cost_lt
+from .operators.lte import _cost_lte
+from .operators.mod import _cost_mod
+from .operators.regex import _cost_regex
+from .operators.size import _cost_size
+
+_op_costs = {
+    "$eq": _cost_eq,
+    "$ne": _cost_ne,
+    "$gt": _cost_gt,
+    "$gte": _cost_gte,
+    "$lt": _cost_lt,
+    "$lte": _cost_lte,
+    "$in": _cost_in,
+    "$nin": _cost_nin,
+    "$regex": _cost_regex,
+    "$mod": _cost_mod,
+    "$size": _cost_size,
+}
+
+
+def _cost_query(query) -> int:
+    # queries that are not dicts are left to the interpreter, which rejects
+    # most of them straight away
+    if not isinstance(query, dict):
+        return 0
+
+    cost = 0
+    for path in query:
+        if not isinstance(path, str):
+            return 0
+        if path in mgqpy.query_ops:
+            cost += _cost_query_op(path, query[path])
+        else:
+            cost += _cost_cond(path, query[path])
+
+    return cost
+
+
+def _cost_query_op(op: str, ov) -> int:
+    cost = _cost_query_ops(ov)
+    if cost:
+        cost += sum(_cost_query(cond) for cond in ov)
+    return cost
+
+
+def _cost_cond(path: str, exp_or_ov) -> int:
+    if not mgqpy._check_all_exp(exp_or_ov):
+        return _cost_op(path, "$eq", exp_or_ov)
+
+    return sum(_cost_op(path, op, ov) for op, ov in exp_or_ov.items())
+
+
+def _cost_op(path: str, op: str, ov) -> int:
+    # every operator walks the path on its own, and every nested field may
+    # fan out over an array
+    walk = path.count(".") + 1
+
+    if op in _op_costs:
+        return walk + _op_costs[op](ov)
+    if op == "$not":
+        return _cost_not(ov) + _cost_cond(path, ov)
+    if op == "$elemMatch":
+        return walk + _cost_elem_match(ov) + _cost_query(ov)
+    if op == "$all":
+        cost = walk + _cost_all(ov)
+        if isinstance(ov, list) and ov and _is_all_elem_match(ov):
+            cost += sum(_cost_query(o["$elemMatch"]) for o in ov)
+        return cost
+
+    # $options only modifies $regex
+    return 0
@@ -0,0 +1,476 @@
+# Rewrites a query into an equivalent query that is cheaper to evaluate.
+#
+# A query is broken down into a conjunction of atoms: conditions with a single
+# operator on a single path ($regex and its $options count as one operator).
+# The operators of an expression are tested independently of each other, so
+# an expression is exactly the conjunction of its atoms, wherever they came
+# from. On the way:
+#
+# - nested $and are flattened into the conjunction
+# - $or and $nor of equalities ($eq, $in) on the same path become $in and $nin
+# - $not and $nor of an atom that has a negated operator ($eq and $ne, $in
+#   and $nin) are replaced by the negated atom, and double negations removed
+# - duplicate atoms and branches are dropped
+# - conditions that never or always match are folded into constants
+#
+# after which the atoms on the same path are merged back into as few
+# expressions as possible, since operators with the same name cannot share one.
+#
+# A conjunction that never matches is written as {"$or": []} and one that
+# always matches as {}. Folding is conservative about arrays: the operators of
+# a conjunction can each be matched by a different element of an array, e.g.
+# {"a": {"$gt": 50, "$lt": 10}} and {"a": 1, "$and": [{"a": 2}]} both match
+# {"a": [60, 5, 1, 2]}. So only atoms that match no value at all ($in: [],
+# invalid operator values, ...) are folded, and conjunctions where an atom is
+# the negation of others, e.g. {"a": {"$eq": 1, "$ne": 1}}.
+#
+# Queries the compiler would defer to the interpreter (not a dict, non-string
+# paths, $and/$or/$nor values that are not lists of such queries) are left
+# as they are.
+
+import datetime
+import decimal
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import mgqpy
+
+from .compiler import _invalid, _validators
+from .operators.in_nin import _validate_in_nin
+
+# (path, expression) or (query operator, value) of a conjunction
+_Conjunct = Tuple[str, Any]
+
+_negations = {
+    "$eq": "$ne",
+    "$ne": "$eq",
+    "$in": "$nin",
+    "$nin": "$in",
+}
+
+# conjunct of a conjunction that never matches
+_never: _Conjunct = ("$or", [])
+
+# values whose repr identifies them, see _key
+_repr_types = {
+    datetime.datetime,
+    datetime.date,
+    datetime.time,
+    datetime.timedelta,
+    decimal.Decimal,
+    uuid.UUID,
+}
+
+
+def _normalize(query):
+    """Equivalent query with the rewrites above applied."""
+
+    return _Normalizer().query(query)
+
+
+def _is_query(query) -> bool:
+    return isinstance(query, dict) and all(isinstance(path, str) for path in query)
+
+
+def _is_query_list(ov) -> bool:
+    return isinstance(ov, list) and all(_is_query(cond) for cond in ov)
+
+
+class _Normalizer:
+    def __init__(self, *, strict: bool = False):
+        # raise on invalid operator values instead of folding them
+        self.strict = strict
+        # subtrees folded into a constant, see fold
+        self.folds: List[dict] = []
+
+    def fold(self, query, result: bool, reason: str):
+        self.folds.append({"query": query, "result": result, "reason": reason})
+
+    def invalid(self, query, message: str):
+        if self.strict:
+            raise TypeError(message)
+        self.fold(query, False, message)
+
+    def query(self, query):
+        if not _is_query(query):
+            return query
+        return _assemble(self.conjuncts(query))
+
+    def conjuncts(self, query: dict) -> List[_Conjunct]:
+        return self.conjunction(self.collect(query))
+
+    def conjunction(self, conjuncts: List[_Conjunct]) -> List[_Conjunct]:
+        conjuncts = _dedupe(conjuncts)
+        if any(_is_never([conjunct]) for conjunct in conjuncts):
+            return [_never]
+        if self.contradiction(conjuncts):
+            return [_never]
+        return _merge(conjuncts)
+
+    def collect(self, query: dict) -> List[_Conjunct]:
+        """Atoms and query operators of the conjunction, before merging."""
+
+        conjuncts: List[_Conjunct] = []
+
+        for path, value in query.items():
+            if path not in mgqpy.query_ops:
+                conjuncts.extend(self.atoms(path, value))
+            elif not isinstance(value, list):
+                self.invalid({path: value}, f"{path} operator value must be a list")
+                conjuncts.append(_never)
+            elif not _is_query_list(value):
+                conjuncts.append((path, value))
+            elif path == "$and":
+                for cond in value:
+                    conjuncts.extend(self.collect(cond))
+            elif path == "$or":
+                conjuncts.extend(self.or_(value))
+            else:
+                conjuncts.extend(self.nor(value))
+
+        return conjuncts
+
+    def atoms(self, path: str, exp_or_ov) -> List[_Conjunct]:
+        if not mgqpy._check_all_exp(exp_or_ov):
+            return [(path, {"$eq": exp_or_ov})]
+
+        atoms: List[_Conjunct] = []
+        regex: Optional[dict] = {
+            op: ov for op, ov in exp_or_ov.items() if op in ("$regex", "$options")
+        }
+
+        for op, ov in exp_or_ov.items():
+            if op in ("$regex", "$options"):
+                # a single atom, where the first of the two is
+                if regex is not None:
+                    atoms.extend(self.atom(path, regex))
+                    regex = None
+            elif op == "$not":
+                atoms.extend(self.not_(path, ov))
+            else:
+                atoms.extend(self.atom(path, {op: ov}))
+
+        return atoms
+
+    def atom(self, path: str, exp: dict) -> List[_Conjunct]:
+        op = "$regex" if "$regex" in exp else next(iter(exp))
+        ov = exp[op]
+
+        if op in _validators and not _validators[op](ov):
+            self.invalid({path: exp}, _invalid[op])
+            return [_never]
+
+        constant = _constant(op, ov)
+        if constant is not None:
+            result, reason = constant
+            self.fold({path: exp}, result, reason)
+            return [] if result else [_never]
+
+        if op == "$elemMatch" and _is_query(ov):
+            query = self.conjuncts(ov)
+            if _is_never(query):
+                self.fold({path: exp}, False, "$elemMatch sub-query never matches")
+                return [_never]
+            return [(path, {op: _assemble(query)})]
+
+        return [(path, exp)]
+
+    def not_(self, path: str, exp_or_ov) -> List[_Conjunct]:
+        # $not matches when {path: exp_or_ov} does not
+        conjuncts = self.conjunction(self.atoms(path, exp_or_ov))
+
+        if not conjuncts:
+            reason = "$not of a condition that always matches"
+            self.fold({path: {"$not": exp_or_ov}}, False, reason)
+            return [_never]
+        if _is_never(conjuncts):
+            reason = "$not of a condition that never matches"
+            self.fold({path: {"$not": exp_or_ov}}, True, reason)
+            return []
+
+        negated = self.negate(conjuncts)
+        if negated is not None:
+            return negated
+        if len(conjuncts) == 1 and conjuncts[0][0] == path:
+            # the rewritten expression, so that it is not folded again
+            return [(path, {"$not": conjuncts[0][1]})]
+        return [(path, {"$not": exp_or_ov})]
+
+    def negate(self, conjuncts: List[_Conjunct]) -> Optional[List[_Conjunct]]:
+        """Conjuncts matching when *conjuncts* do not, if there is such a rewrite."""
+
+        if len(conjuncts) != 1:
+            return None
+
+        path, exp = conjuncts[0]
+        if path in mgqpy.query_ops or len(exp) != 1:
+            return None
+
+        [(op, ov)] = exp.items()
+        if op == "$not":
+            return self.atoms(path, ov)
+        if op in ("$eq", "$ne"):
+            return [(path, {_negations[op]: ov})]
+        # an invalid $in never matches, but neither does an invalid $nin
+        if op in ("$in", "$nin") and _validate_in_nin(ov):
+            return [(path, {_negations[op]: ov})]
+        return None
+
+    def or_(self, conds: list) -> List[_Conjunct]:
+        branches = self.branches("$or", conds)
+        if branches is None:
+            return []
+        if not branches:
+            if conds:
+                self.fold({"$or": conds}, False, "no branch of $or can match")
+            return [_never]
+        if len(branches) == 1:
+            return branches[0]
+        return [("$or", [_assemble(branch) for branch in branches])]
+
+    def nor(self, conds: list) -> List[_Conjunct]:
+        branches = self.branches("$nor", conds)
+        if branches is None:
+            return [_never]
+        if not branches and conds:
+            self.fold({"$nor": conds}, True, "no branch of $nor can match")
+
+        conjuncts: List[_Conjunct] = []
+        rest: List[List[_Conjunct]] = []
+        for branch in branches:
+            negated = self.negate(branch)
+            if negated is None:
+                rest.append(branch)
+            else:
+                conjuncts.extend(negated)
+
+        if rest:
+            conjuncts.append(("$nor", [_assemble(branch) for branch in rest]))
+        return conjuncts
+
+    def branches(self, op: str, conds: list) -> Optional[List[List[_Conjunct]]]:
+        """
+        Conjuncts of each branch of a disjunction, with nested disjunctions
+        flattened, duplicates and branches that never match dropped, and
+        equalities on a path combined into $in. None if a branch always
+        matches, or a branch and its negation are both there.
+        """
+
+        branches: List[List[_Conjunct]] = []
+        for cond in conds:
+            branch = self.conjuncts(cond)
+            if not branch:
+                self.fold({op: conds}, op == "$or", f"a branch of {op} always matches")
+                return None
+            if _is_never(branch):
+                continue
+            if (
+                len(branch) == 1
+                and branch[0][0] == "$or"
+                and _is_query_list(branch[0][1])
+            ):
+                branches.extend(self.conjuncts(c) for c in branch[0][1])
+            else:
+                branches.append(branch)
+
+        branches = _in(_dedupe(branches))
+
+        keys = {_key(branch) for branch in branches}
+        for branch in branches:
+            negated = _Normalizer().negate(branch)
+            if negated is not None and _key(_merge(negated)) in keys:
+                reason = f"{op} of a condition and its negation"
+                self.fold({op: conds}, op == "$or", reason)
+                return None
+
+        return branches
+
+    def contradiction(self, conjuncts: List[_Conjunct]) -> bool:
+        """
+        Whether the conjuncts of a conjunction can never match together, as
+        one of them matches exactly when others do not: an equality or $in
+        whose values are all excluded by $ne and $nin on the same path, or a
+        $not or $nor branch of conditions that are all in the conjunction.
+        """
+
+        keys = {_key(conjunct) for conjunct in conjuncts}
+        excluded: Dict[str, set] = {}
+        for path, exp in conjuncts:
+            if path not in mgqpy.query_ops:
+                values = _values(exp, "$ne", "$nin")
+                excluded.setdefault(path, set()).update(_key(v) for v in values)
+
+        for path, exp in conjuncts:
+            if path == "$nor" and _is_query_list(exp):
+                negated = [_Normalizer().collect(branch) for branch in exp]
+            elif path in mgqpy.query_ops:
+                continue
+            elif "$not" in exp:
+                negated = [_Normalizer().atoms(path, exp["$not"])]
+            else:
+                values = _values(exp, "$eq", "$in")
+                if values and {_key(v) for v in values} <= excluded[path]:
+                    involved = [c for c in conjuncts if c[0] == path]
+                    reason = "all values are excluded by $ne or $nin"
+                    self.fold(_assemble(_merge(involved)), False, reason)
+                    return True
+                continue
+
+            for atoms in negated:
+                if atoms and all(_key(atom) in keys for atom in atoms):
+                    involved = [(path, exp), *atoms]
+                    reason = "$and of a condition and its negation"
+                    self.fold(_assemble(_merge(involved)), False, reason)
+                    return True
+
+        return False
+
+
+def _constant(op: str, ov) -> Optional[Tuple[bool, str]]:
+    """Result of an atom that never or always matches, and why."""
+
+    if op in ("$in", "$all") and not ov:
+        return False, f"{op} without values never matches"
+    if op == "$nin" and not ov:
+        return True, "$nin without values always matches"
+    if op == "$options":
+        return True, "$options without $regex always matches"
+    if op == "$size":
+        try:
+            if int(ov) < 0:
+                return False, "$size is negative"
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return None
+
+
+def _values(exp: dict, eq: str, in_: str) -> list:
+    """Values of the equality or $in (or their negations) of an atom."""
+
+    if eq in exp:
+        return [exp[eq]]
+    if in_ in exp and _validate_in_nin(exp[in_]):
+        return exp[in_]
+    return []
+
+
+def _is_never(conjuncts: List[_Conjunct]) -> bool:
+    if len(conjuncts) != 1:
+        return False
+    path, value = conjuncts[0]
+    return path == "$or" and isinstance(value, list) and not value
+
+
+def _in(branches: List[List[_Conjunct]]) -> List[List[_Conjunct]]:
+    values: Dict[str, list] = {}
+    counts: Dict[str, int] = {}
+    for branch in branches:
+        path = _equality(branch)
+        if path is not None:
+            [(_, exp)] = branch
+            values.setdefault(path, []).extend(exp.get("$in", [exp.get("$eq")]))
+            counts[path] = counts.get(path, 0) + 1
+
+    combined: List[List[_Conjunct]] = []
+    for branch in branches:
+        path = _equality(branch)
+        if path is None or counts[path] == 1:
+            combined.append(branch)
+        elif path in values:
+            combined.append([(path, {"$in": values.pop(path)})])
+
+    return combined
+
+
+def _equality(branch: List[_Conjunct]) -> Optional[str]:
+    """Path of a branch that is a single $eq or $in."""
+
+    if len(branch) != 1:
+        return None
+
+    path, exp = branch[0]
+    if path in mgqpy.query_ops or len(exp) != 1:
+        return None
+    if "$eq" in exp or ("$in" in exp and _validate_in_nin(exp["$in"])):
+        return path
+    return None
+
+
+def _dedupe(items: list) -> list:
+    seen = set()
+    unique = []
+    for item in items:
+        key = _key(item)
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def _merge(conjuncts: List[_Conjunct]) -> List[_Conjunct]:
+    """Merge the expressions on the same path that have no operator in common."""
+
+    merged: List[_Conjunct] = []
+    for path, exp in conjuncts:
+        if path not in mgqpy.query_ops:
+            for other, other_exp in merged:
+                if other == path and not _ops(exp) & _ops(other_exp):
+                    other_exp.update(exp)
+                    break
+            else:
+                merged.append((path, dict(exp)))
+        else:
+            merged.append((path, exp))
+
+    return merged
+
+
+def _ops(exp: dict) -> set:
+    return {"$regex" if op == "$options" else op for op in exp}
+
+
+def _assemble(conjuncts: List[_Conjunct]) -> dict:
+    query: Dict[str, Any] = {}
+    rest = []
+
+    for path, value in conjuncts:
+        if path not in mgqpy.query_ops:
+            value = _exp_or_ov(value)
+        if path in query or path == "$and":
+            rest.append({path: value})
+        else:
+            query[path] = value
+
+    if rest:
+        query["$and"] = rest
+    return query
+
+
+def _exp_or_ov(exp: dict):
+    # a lone equality is written as the value, unless it looks like an expression
+    if len(exp) == 1 and "$eq" in exp and not isinstance(exp["$eq"], dict):
+        return exp["$eq"]
+    return exp
+
+
+def _key(value) -> Any:
+    """
+    Hashable key of a value in a query, equal only for values that match the
+    same documents, e.g. 1, 1.0 and True have different keys.
+    """
+
+    if value is None or type(value) in (str, int, bool):
+        return (type(value), value)
+    if type(value) is float:
+        # tells nan and -0.0 apart
+        return (float, repr(value))
+    if type(value) is dict:
+        return (dict, tuple((_key(k), _key(v)) for k, v in value.items()))
+    if type(value) in (list, tuple):
+        return (type(value), tuple(_key(v) for v in value))
+    if isinstance(value, re.Pattern):
+        return (re.Pattern, value.pattern, value.flags)
+    if type(value) in _repr_types:
+        return (type(value), repr(value))
+    return (type(value), id(value))
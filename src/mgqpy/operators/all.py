@@ -1,9 +1,15 @@
-from typing import List
+from typing import Any, Callable, Tuple
 
 import mgqpy
+from mgqpy.operators.in_nin import _is_plain, _plain
+from mgqpy.path import _Path
 
+# fewest plain values for which a set of the array is built, below that
+# scanning the array for each value is cheaper
+_min_set_values = 3
 
-def _match_all(doc, path: List[str], ov) -> bool:
+
+def _match_all(doc, path: _Path, ov, i: int = 0) -> bool:
     if not _validate_all(ov):
         return False
 
@@ -11,32 +17,85 @@ def _match_all(doc, path: List[str], ov) -> bool:
         return False
 
     if _is_all_elem_match(ov):
-        elem_match_query = {"$and": [{".".join(path): o} for o in ov]}
+        elem_match_query = _all_elem_match_query(".".join(path.keys[i:]), ov)
         return mgqpy._match_cond(elem_match_query, doc)
 
-    if len(path) == 0:
-        if not isinstance(doc, list):
-            return False
-
-        return all([o in doc or o == doc for o in ov])
+    if i == len(path):
+        return _leaf_all(doc, ov)
 
-    key = path[0]
-    rest = path[1:]
+    key = path.keys[i]
 
     if isinstance(doc, dict) and key in doc:
-        return _match_all(doc[key], rest, ov)
+        return _match_all(doc[key], path, ov, i + 1)
 
-    if isinstance(doc, list) and key.isdigit():
-        idx = int(key)
-        if idx < len(doc):
-            return _match_all(doc[idx], rest, ov)
+    idx = path.indices[i]
+    if isinstance(doc, list) and idx is not None and idx < len(doc):
+        return _match_all(doc[idx], path, ov, i + 1)
 
     if isinstance(doc, list):
-        return any([_match_all(d, path, ov) for d in doc])
+        for d in doc:
+            if _match_all(d, path, ov, i):
+                return True
+        return False
 
     return False
 
 
+def _leaf_all(doc, ov) -> bool:
+    if not isinstance(doc, list):
+        return False
+
+    for o in ov:
+        if not (o in doc or o == doc):
+            return False
+    return True
+
+
+class _Required:
+    """Values of $all split into plain values (see in_nin) and the others."""
+
+    def __init__(self, ov: list):
+        self.plain = frozenset(o for o in ov if _is_plain(o))
+        self.others = [o for o in ov if not _is_plain(o)]
+
+
+def _leaf_all_set(doc, required: _Required) -> bool:
+    """
+    `_leaf_all` with the values prepared as `_Required`: plain values are
+    looked up in a set of the plain elements of the array, built once, or
+    else among the other elements. Plain values never equal the array itself.
+    """
+
+    if not isinstance(doc, list):
+        return False
+
+    elements = set()
+    rest = []
+    for d in doc:
+        if type(d) in _plain:
+            elements.add(d)
+        else:
+            rest.append(d)
+
+    for o in required.plain:
+        if o not in elements and o not in rest:
+            return False
+
+    for o in required.others:
+        if not (o in doc or o == doc):
+            return False
+    return True
+
+
+def _prepare_all(ov) -> Tuple[Callable[[Any, Any], bool], Any]:
+    """Leaf test and operator value for a query being compiled."""
+
+    required = _Required(ov)
+    if len(required.plain) < _min_set_values:
+        return _leaf_all, ov
+    return _leaf_all_set, required
+
+
 # $all can be a list of values, or only $elemMatch if $ expression is in a list of dicts
 def _validate_all(ov) -> bool:
     is_list = isinstance(ov, list)
@@ -48,5 +107,22 @@ def _validate_all(ov) -> bool:
     return is_list
 
 
+def _all_elem_match_query(path: str, ov: list) -> dict:
+    """Query matching $all of $elemMatch, one $elemMatch per condition."""
+    return {"$and": [{path: o} for o in ov]}
+
+
 def _is_all_elem_match(ov) -> bool:
-    return all(isinstance(o, dict) and "$elemMatch" in o for o in ov)
+    for o in ov:
+        if not (isinstance(o, dict) and "$elemMatch" in o):
+            return False
+    return True
+
+
+def _cost_all(ov) -> int:
+    """Cost of the containment check, excluding $elemMatch sub-queries."""
+    if not _validate_all(ov) or len(ov) == 0:
+        return 0
+    if _is_all_elem_match(ov):
+        return 8 * len(ov)
+    return 1 + len(ov)
@@ -29,3 +29,10 @@ def _validate_query_ops(ov) -> bool:
     """
 
     return isinstance(ov, list)
+
+
+def _cost_query_ops(ov) -> int:
+    """Cost of the query op, excluding its conditions."""
+    if not _validate_query_ops(ov):
+        return 0
+    return 1
@@ -1,31 +1,55 @@
+from typing import Any, Callable
+
 import mgqpy
+from mgqpy.path import _Path
 
 
-from typing import List
+def _match_elem_match(doc, path: _Path, ov, i: int = 0) -> bool:
+    if i == len(path):
+        return _leaf_elem_match(doc, ov)
 
+    key = path.keys[i]
 
-def _match_elem_match(doc, path: List[str], ov) -> bool:
-    if len(path) == 0:
-        if not isinstance(doc, list):
-            return False
+    if isinstance(doc, dict) and key in doc:
+        return _match_elem_match(doc[key], path, ov, i + 1)
 
-        if any(mgqpy._match_cond(ov, d) for d in doc):
-            return True
+    idx = path.indices[i]
+    if isinstance(doc, list) and idx is not None and idx < len(doc):
+        return _match_elem_match(doc[idx], path, ov, i + 1)
 
+    if isinstance(doc, list):
+        for d in doc:
+            if _match_elem_match(d, path, ov, i):
+                return True
         return False
 
-    key = path[0]
-    rest = path[1:]
+    return False
 
-    if isinstance(doc, dict) and key in doc:
-        return _match_elem_match(doc[key], rest, ov)
 
-    if isinstance(doc, list) and key.isdigit():
-        idx = int(key)
-        if idx < len(doc):
-            return _match_elem_match(doc[idx], rest, ov)
+def _leaf_elem_match(doc, ov) -> bool:
+    if not isinstance(doc, list):
+        return False
 
-    if isinstance(doc, list):
-        return any([_match_elem_match(d, path, ov) for d in doc])
+    for d in doc:
+        if mgqpy._match_cond(ov, d):
+            return True
 
     return False
+
+
+def _leaf_elem_match_compiled(doc, pred: Callable[[Any], bool]) -> bool:
+    """`_leaf_elem_match` with the sub-query compiled to a predicate."""
+
+    if not isinstance(doc, list):
+        return False
+
+    for d in doc:
+        if pred(d):
+            return True
+
+    return False
+
+
+def _cost_elem_match(ov) -> int:
+    """Cost of iterating the array, excluding the sub-query."""
+    return 8
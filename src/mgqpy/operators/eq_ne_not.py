@@ -1,35 +1,30 @@
 import re
-from typing import List
+from typing import Any, Callable, Tuple
 
-from mgqpy.utils import coerce
+from mgqpy.path import _Path
+from mgqpy.utils import _coerce_doc, _Coerced, _is_coercible, coerce
 
 import mgqpy
 
 
-def _match_eq(doc, path: List[str], ov) -> bool:
-    if len(path) == 0:
-        if isinstance(doc, list) and any([_match_eq(d, path, ov) for d in doc]):
-            return True
+def _match_eq(doc, path: _Path, ov, i: int = 0) -> bool:
+    if i == len(path):
+        return _leaf_eq(doc, ov)
 
-        if isinstance(ov, re.Pattern) and isinstance(doc, str):
-            return bool(ov.search(doc))
-
-        doc, ov = coerce(doc, ov)
-        return doc == ov
-
-    key = path[0]
-    rest = path[1:]
+    key = path.keys[i]
 
     if isinstance(doc, dict) and key in doc:
-        return _match_eq(doc[key], rest, ov)
+        return _match_eq(doc[key], path, ov, i + 1)
 
-    if isinstance(doc, list) and key.isdigit():
-        idx = int(key)
-        if idx < len(doc):
-            return _match_eq(doc[idx], rest, ov)
+    idx = path.indices[i]
+    if isinstance(doc, list) and idx is not None and idx < len(doc):
+        return _match_eq(doc[idx], path, ov, i + 1)
 
     if isinstance(doc, list):
-        return any([_match_eq(d, path, ov) for d in doc])
+        for d in doc:
+            if _match_eq(d, path, ov, i):
+                return True
+        return False
 
     if ov is None:
         return True
@@ -37,9 +32,58 @@ def _match_eq(doc, path: List[str], ov) -> bool:
     return False
 
 
-def _match_ne(doc, path: List[str], ov) -> bool:
+def _leaf_eq(doc, ov) -> bool:
+    if isinstance(doc, list):
+        for d in doc:
+            if _leaf_eq(d, ov):
+                return True
+
+    if isinstance(ov, re.Pattern) and isinstance(doc, str):
+        return bool(ov.search(doc))
+
+    doc, ov = coerce(doc, ov)
+    return doc == ov
+
+
+def _leaf_eq_coerced(doc, c: _Coerced) -> bool:
+    """`_leaf_eq` with the operator value coerced when compiling."""
+
+    if isinstance(doc, list):
+        for d in doc:
+            if _leaf_eq_coerced(d, c):
+                return True
+
+    doc, ov = _coerce_doc(doc, c)
+    return doc == ov
+
+
+def _prepare_eq(ov) -> Tuple[Callable[[Any, Any], bool], Any]:
+    """Leaf test and operator value for a query being compiled."""
+
+    if _is_coercible(ov):
+        return _leaf_eq_coerced, _Coerced(ov)
+    return _leaf_eq, ov
+
+
+def _match_ne(doc, path: _Path, ov) -> bool:
     return not _match_eq(doc, path, ov)
 
 
 def _match_not(doc, path, ov):
     return not mgqpy._match_cond({path: ov}, doc)
+
+
+def _cost_eq(ov) -> int:
+    if isinstance(ov, re.Pattern):
+        return 4
+    return 1
+
+
+def _cost_ne(ov) -> int:
+    # rarely decisive, so it is ranked after an equality on the same path
+    return _cost_eq(ov) + 1
+
+
+def _cost_not(ov) -> int:
+    """Cost of the negation, excluding the negated condition."""
+    return 0
@@ -1,56 +1,112 @@
 import operator
 from itertools import zip_longest
 from numbers import Number
-from typing import List
+from typing import Any, Callable, Tuple
 
-from mgqpy.utils import coerce
+from mgqpy.path import _Path
+from mgqpy.utils import _coerce_doc, _Coerced, _is_coercible, coerce
 
 
-def _match_gt(doc, path: List[str], ov) -> bool:
-    if len(path) == 0:
-        if isinstance(doc, list) and any([_match_gt(d, path, ov) for d in doc]):
-            return True
+def _match_gt(doc, path: _Path, ov, i: int = 0) -> bool:
+    if i == len(path):
+        return _leaf_gt(doc, ov)
+
+    key = path.keys[i]
+
+    if isinstance(doc, dict) and key in doc:
+        return _match_gt(doc[key], path, ov, i + 1)
+
+    idx = path.indices[i]
+    if isinstance(doc, list) and idx is not None and idx < len(doc):
+        return _match_gt(doc[idx], path, ov, i + 1)
 
-        if isinstance(doc, list) and isinstance(ov, list):
-            if doc > ov:
+    if isinstance(doc, list):
+        for d in doc:
+            if _match_gt(d, path, ov, i):
                 return True
+        return False
 
-        if isinstance(doc, dict) and isinstance(ov, dict):
-            keys = zip_longest(doc.keys(), ov.keys())
-            for doc_key, ov_key in keys:
-                if doc_key is None:
-                    return False
-                if ov_key is None:
-                    return True
-                if doc_key != ov_key:
-                    return doc_key > ov_key
-                if doc_key == ov_key:
-                    if doc[doc_key] > ov[ov_key]:
-                        return True
-                    if doc[doc_key] < ov[ov_key]:
-                        return False
-            return False
-
-        try:
-            doc, ov = coerce(doc, ov)
-            return operator.gt(doc, ov)
-        except Exception:
-            pass
+    return False
+
+
+def _leaf_gt(doc, ov) -> bool:
+    if isinstance(doc, list):
+        for d in doc:
+            if _leaf_gt(d, ov):
+                return True
 
+    if isinstance(doc, list) and isinstance(ov, list):
+        if doc > ov:
+            return True
+
+    if isinstance(doc, dict) and isinstance(ov, dict):
+        keys = zip_longest(doc.keys(), ov.keys())
+        for doc_key, ov_key in keys:
+            if doc_key is None:
+                return False
+            if ov_key is None:
+                return True
+            if doc_key != ov_key:
+                return doc_key > ov_key
+            if doc_key == ov_key:
+                if doc[doc_key] > ov[ov_key]:
+                    return True
+                if doc[doc_key] < ov[ov_key]:
+                    return False
         return False
 
-    key = path[0]
-    rest = path[1:]
+    try:
+        doc, ov = coerce(doc, ov)
+        return operator.gt(doc, ov)
+    except Exception:
+        pass
 
-    if isinstance(doc, dict) and key in doc:
-        return _match_gt(doc[key], rest, ov)
+    return False
 
-    if isinstance(doc, list) and key.isdigit():
-        idx = int(key)
-        if idx < len(doc):
-            return _match_gt(doc[idx], rest, ov)
+
+def _leaf_gt_coerced(doc, c: _Coerced) -> bool:
+    """`_leaf_gt` with the operator value coerced when compiling."""
 
     if isinstance(doc, list):
-        return any([_match_gt(d, path, ov) for d in doc])
+        for d in doc:
+            if _leaf_gt_coerced(d, c):
+                return True
+
+    try:
+        doc, ov = _coerce_doc(doc, c)
+        return operator.gt(doc, ov)
+    except Exception:
+        pass
 
     return False
+
+
+def _leaf_gt_number(doc, c: _Coerced) -> bool:
+    """`_leaf_gt_coerced` for an int or float operator value."""
+
+    if type(doc) is int or type(doc) is float:
+        return doc > c.value
+
+    if type(doc) is list:
+        for d in doc:
+            if _leaf_gt_number(d, c):
+                return True
+        # an array is never > a number
+        return False
+
+    return _leaf_gt_coerced(doc, c)
+
+
+def _prepare_gt(ov) -> Tuple[Callable[[Any, Any], bool], Any]:
+    """Leaf test and operator value for a query being compiled."""
+
+    if type(ov) is int or type(ov) is float:
+        # compared directly to int and float leaves
+        return _leaf_gt_number, _Coerced(ov)
+    if _is_coercible(ov):
+        return _leaf_gt_coerced, _Coerced(ov)
+    return _leaf_gt, ov
+
+
+def _cost_gt(ov) -> int:
+    return 2
@@ -1,32 +1,36 @@
-from mgqpy.operators.eq_ne_not import _match_eq
+import math
+import re
+from typing import Any, Callable, Tuple
 
+from mgqpy.operators.eq_ne_not import _leaf_eq, _prepare_eq
+from mgqpy.operators.regex import _merge_regexes
+from mgqpy.path import _Path
 
-from typing import List
+# values that only ever equal values of these same types, by == and hash
+_plain = {str, int, float, bool, type(None)}
 
 
-def _match_in(doc, path: List[str], ov) -> bool:
+def _match_in(doc, path: _Path, ov, i: int = 0) -> bool:
     if not _validate_in_nin(ov):
         return False
 
-    if len(path) == 0:
-        if isinstance(doc, list) and any([_match_in(d, path, ov) for d in doc]):
-            return True
-
-        return any([_match_eq(doc, path, o) for o in ov])
+    if i == len(path):
+        return _leaf_in(doc, ov)
 
-    key = path[0]
-    rest = path[1:]
+    key = path.keys[i]
 
     if isinstance(doc, dict) and key in doc:
-        return _match_in(doc[key], rest, ov)
+        return _match_in(doc[key], path, ov, i + 1)
 
-    if isinstance(doc, list) and key.isdigit():
-        idx = int(key)
-        if idx < len(doc):
-            return _match_in(doc[idx], rest, ov)
+    idx = path.indices[i]
+    if isinstance(doc, list) and idx is not None and idx < len(doc):
+        return _match_in(doc[idx], path, ov, i + 1)
 
     if isinstance(doc, list):
-        return any([_match_in(d, path, ov) for d in doc])
+        for d in doc:
+            if _match_in(d, path, ov, i):
+                return True
+        return False
 
     if None in ov:
         return True
@@ -34,7 +38,86 @@ def _match_in(doc, path: List[str], ov) -> bool:
     return False
 
 
-def _match_nin(doc, path: List[str], ov) -> bool:
+def _leaf_in(doc, ov) -> bool:
+    if isinstance(doc, list):
+        for d in doc:
+            if _leaf_in(d, ov):
+                return True
+
+    for o in ov:
+        if _leaf_eq(doc, o):
+            return True
+    return False
+
+
+class _Members:
+    """
+    Values of $in/$nin split for membership tests: plain values in a set,
+    regexes merged into as few alternations as possible (which only strings
+    can match), and the remaining values that `_leaf_eq` gives special
+    semantics to (dates, decimals, UUIDs, ...) or that are unhashable, kept
+    in a list.
+    """
+
+    def __init__(self, ov: list):
+        self.values = ov
+        self.plain = frozenset(o for o in ov if _is_plain(o))
+        self.regexes = _merge_regexes([o for o in ov if _is_str_regex(o)])
+        self.others = [o for o in ov if not _is_plain(o) and not _is_str_regex(o)]
+        # equality tests of all values, for documents that are not plain
+        self.tests = [_prepare_eq(o) for o in ov]
+
+
+def _is_plain(o) -> bool:
+    # nan never equals itself, but a set finds it by identity
+    return type(o) in _plain and not (type(o) is float and math.isnan(o))
+
+
+def _is_str_regex(o) -> bool:
+    return isinstance(o, re.Pattern) and isinstance(o.pattern, str)
+
+
+def _leaf_in_set(doc, members: _Members) -> bool:
+    """`_leaf_in` with the values prepared as `_Members`."""
+
+    if isinstance(doc, list):
+        for d in doc:
+            if _leaf_in_set(d, members):
+                return True
+
+        # the array itself, which only non-plain values can equal
+        for o in members.others:
+            if doc == o:
+                return True
+        return False
+
+    if type(doc) not in _plain:
+        for leaf, o in members.tests:
+            if leaf(doc, o):
+                return True
+        return False
+
+    if doc in members.plain:
+        return True
+
+    if type(doc) is str:
+        for regex in members.regexes:
+            if regex.search(doc):
+                return True
+
+    for o in members.others:
+        if _leaf_eq(doc, o):
+            return True
+    return False
+
+
+def _prepare_in(ov) -> Tuple[Callable[[Any, Any], bool], Any]:
+    """Leaf test and operator value for a query being compiled."""
+
+    return _leaf_in_set, _Members(ov)
+
+
+def _match_nin(doc, path: _Path, ov) -> bool:
     if not _validate_in_nin(ov):
         return False
 
@@ -43,3 +126,14 @@ def _match_nin(doc, path: List[str], ov) -> bool:
 
 def _validate_in_nin(ov):
     return isinstance(ov, list)
+
+
+def _cost_in(ov) -> int:
+    if not _validate_in_nin(ov):
+        return 0
+    # plain values are looked up in a set once compiled
+    return 1 + sum(1 for o in ov if not _is_plain(o))
+
+
+def _cost_nin(ov) -> int:
+    return _cost_in(ov) + 1
@@ -0,0 +1,69 @@
+import math
+from typing import Any, Callable, List, Tuple
+
+from mgqpy.operators.gt import _leaf_gt_number
+from mgqpy.operators.gte import _leaf_gte_number
+from mgqpy.operators.lt import _leaf_lt_number
+from mgqpy.operators.lte import _leaf_lte_number
+
+# leaf tests of range operators with an int or float value
+_number_leaves = {
+    "$gt": _leaf_gt_number,
+    "$gte": _leaf_gte_number,
+    "$lt": _leaf_lt_number,
+    "$lte": _leaf_lte_number,
+}
+
+
+class _Interval:
+    """
+    Range operators ($gt, $gte, $lt, $lte) of an expression, tested on a leaf
+    together. On an array leaf, or across the terminals of a path (see
+    mgqpy.path), every operator is still satisfied by any element on its own.
+
+    When all operator values are ints or floats, they are also reduced to the
+    tightest lower and upper bound, against which int and float leaves are
+    checked at once. These bounds are the range of values to look up in a
+    sorted index.
+    """
+
+    def __init__(self, bounds: List[Tuple[str, Callable[[Any, Any], bool], Any]]):
+        # (op, leaf test, operator value) of each operator, prepared when compiling
+        self.ops = bounds
+        self.bounds = [(leaf, ov) for _, leaf, ov in bounds]
+        # the defaults -inf and inf still fail nan leaves, unlike no bound at all
+        self.has_lower = any(op in ("$gt", "$gte") for op, _, _ in bounds)
+        self.has_upper = any(op in ("$lt", "$lte") for op, _, _ in bounds)
+        self.lower = -math.inf
+        self.lower_inclusive = True
+        self.upper = math.inf
+        self.upper_inclusive = True
+
+        self.numbers = all(
+            leaf is _number_leaves.get(op) and not math.isnan(ov.value)
+            for op, leaf, ov in bounds
+        )
+        if not self.numbers:
+            return
+
+        for op, _, ov in bounds:
+            value = ov.value
+            if op in ("$gt", "$gte"):
+                if value > self.lower or (value == self.lower and op == "$gt"):
+                    self.lower, self.lower_inclusive = value, op == "$gte"
+            elif value < self.upper or (value == self.upper and op == "$lt"):
+                self.upper, self.upper_inclusive = value, op == "$lte"
+
+
+def _leaf_interval(doc, interval: _Interval) -> bool:
+    if interval.numbers and (type(doc) is int or type(doc) is float):
+        lower = interval.lower
+        upper = interval.upper
+        return (lower <= doc if interval.lower_inclusive else lower < doc) and (
+            doc <= upper if interval.upper_inclusive else doc < upper
+        )
+
+    for leaf, ov in interval.bounds:
+        if not leaf(doc, ov):
+            return False
+    return True
@@ -1,40 +1,74 @@
 import math
 from numbers import Number
-from typing import List
+from typing import Any, Callable, Tuple
 
+from mgqpy.path import _Path
 
-def _match_mod(doc, path: List[str], ov) -> bool:
+
+def _match_mod(doc, path: _Path, ov, i: int = 0) -> bool:
     if not _validate_mod(ov):
         return False
 
-    if len(path) == 0:
-        if isinstance(doc, list) and any([_match_mod(d, path, ov) for d in doc]):
-            return True
+    if i == len(path):
+        return _leaf_mod(doc, ov)
 
-        if not isinstance(doc, Number):
-            return False
+    key = path.keys[i]
 
-        divisor = math.floor(ov[0])
-        expected_remainer = math.floor(ov[1])
-        doc_remainer = math.floor(doc % divisor)
+    if isinstance(doc, dict) and key in doc:
+        return _match_mod(doc[key], path, ov, i + 1)
 
-        return doc_remainer == expected_remainer
+    idx = path.indices[i]
+    if isinstance(doc, list) and idx is not None and idx < len(doc):
+        return _match_mod(doc[idx], path, ov, i + 1)
 
-    key = path[0]
-    rest = path[1:]
+    if isinstance(doc, list):
+        for d in doc:
+            if _match_mod(d, path, ov, i):
+                return True
+        return False
 
-    if isinstance(doc, dict) and key in doc:
-        return _match_mod(doc[key], rest, ov)
+    return False
 
-    if isinstance(doc, list) and key.isdigit():
-        idx = int(key)
-        if idx < len(doc):
-            return _match_mod(doc[idx], rest, ov)
 
+def _leaf_mod(doc, ov) -> bool:
     if isinstance(doc, list):
-        return any([_match_mod(d, path, ov) for d in doc])
+        for d in doc:
+            if _leaf_mod(d, ov):
+                return True
+
+    if not isinstance(doc, Number):
+        return False
+
+    divisor = math.floor(ov[0])
+    expected_remainer = math.floor(ov[1])
+    doc_remainer = math.floor(doc % divisor)
+
+    return doc_remainer == expected_remainer
 
-    return False
+
+def _leaf_mod_floored(doc, ov: Tuple[int, int]) -> bool:
+    """`_leaf_mod` with the divisor and remainder floored when compiling."""
+
+    if isinstance(doc, list):
+        for d in doc:
+            if _leaf_mod_floored(d, ov):
+                return True
+
+    if not isinstance(doc, Number):
+        return False
+
+    divisor, remainder = ov
+    return math.floor(doc % divisor) == remainder
+
+
+def _prepare_mod(ov) -> Tuple[Callable[[Any, Any], bool], Any]:
+    """Leaf test and operator value for a query being compiled."""
+
+    try:
+        return _leaf_mod_floored, (math.floor(ov[0]), math.floor(ov[1]))
+    except (TypeError, ValueError, OverflowError):
+        # nan, infinity and complex numbers, which the leaf test raises on
+        return _leaf_mod, ov
 
 
 def _validate_mod(ov):
@@ -44,3 +78,7 @@ def _validate_mod(ov):
         and isinstance(ov[0], Number)
         and isinstance(ov[1], Number)
     )
+
+
+def _cost_mod(ov) -> int:
+    return 2
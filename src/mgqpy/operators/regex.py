@@ -1,44 +1,237 @@
 import re
-from typing import List
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from mgqpy.path import _Path
 
-def _match_regex(doc, path: List[str], ov) -> bool:
-    if len(path) == 0:
-        if isinstance(doc, list) and any([_match_regex(d, path, ov) for d in doc]):
-            return True
 
-        if not isinstance(doc, str):
-            return False
+def _match_regex(doc, path: _Path, ov, i: int = 0) -> bool:
+    if i == len(path):
+        return _leaf_regex(doc, ov)
 
-        flags = re.NOFLAG
-        if "i" in ov["$options"]:
-            flags = flags | re.IGNORECASE
-        if "m" in ov["$options"]:
-            flags = flags | re.MULTILINE
-        if "s" in ov["$options"]:
-            flags = flags | re.DOTALL
-        if "x" in ov["$options"]:
-            flags = flags | re.VERBOSE
+    key = path.keys[i]
 
-        matcher = re.compile(ov["$regex"], flags)
+    if isinstance(doc, dict) and key in doc:
+        return _match_regex(doc[key], path, ov, i + 1)
 
-        if matcher.search(doc):
-            return True
+    idx = path.indices[i]
+    if isinstance(doc, list) and idx is not None and idx < len(doc):
+        return _match_regex(doc[idx], path, ov, i + 1)
 
+    if isinstance(doc, list):
+        for d in doc:
+            if _match_regex(d, path, ov, i):
+                return True
         return False
 
-    key = path[0]
-    rest = path[1:]
-
-    if isinstance(doc, dict) and key in doc:
-        return _match_regex(doc[key], rest, ov)
+    return False
 
-    if isinstance(doc, list) and key.isdigit():
-        idx = int(key)
-        if idx < len(doc):
-            return _match_regex(doc[idx], rest, ov)
 
+def _leaf_regex(doc, ov) -> bool:
     if isinstance(doc, list):
-        return any([_match_regex(d, path, ov) for d in doc])
+        for d in doc:
+            if _leaf_regex(d, ov):
+                return True
+
+    if not isinstance(doc, str):
+        return False
+
+    matcher = _compile_regex(ov["$regex"], _regex_flags(ov["$options"]))
+
+    if matcher.search(doc):
+        return True
 
     return False
+
+
+def _leaf_search(doc, matcher: re.Pattern) -> bool:
+    """`_leaf_regex` with the regex already compiled."""
+
+    if isinstance(doc, list):
+        for d in doc:
+            if _leaf_search(d, matcher):
+                return True
+
+    if not isinstance(doc, str):
+        return False
+
+    return matcher.search(doc) is not None
+
+
+def _prepare_regex(ov) -> Tuple[Callable[[Any, Any], bool], Any]:
+    """
+    Leaf test and operator value for a query being compiled: the compiled regex
+    if possible. Invalid regexes are left to `_leaf_regex`, which only raises
+    once a string is tested, like the interpreter.
+    """
+
+    try:
+        matcher = _compile_regex(ov["$regex"], _regex_flags(ov["$options"]))
+    except Exception:
+        return _leaf_regex, ov
+
+    literal = _literal_test(ov["$regex"], matcher)
+    if literal is not None:
+        return _leaf_literal, literal
+
+    return _leaf_search, matcher
+
+
+def _leaf_literal(doc, test: Callable[[str], bool]) -> bool:
+    """`_leaf_search` for a regex that matches a literal (see `_literal_test`)."""
+
+    if isinstance(doc, list):
+        for d in doc:
+            if _leaf_literal(d, test):
+                return True
+
+    if not isinstance(doc, str):
+        return False
+
+    return test(doc)
+
+
+# characters with a special meaning in a regex, unless escaped
+_special = frozenset(".^$*+?{}[]\\|()")
+
+
+def _literal_test(pattern, matcher: re.Pattern) -> Optional[Callable[[str], bool]]:
+    """
+    Test equivalent to `matcher.search(doc)` done with string operations, for
+    regexes that match a literal, optionally anchored with ^ and $ (`abc`,
+    `^abc`, `abc$`, `^abc$`), without options other than i and s. None if
+    the regex is not such a literal.
+    """
+
+    if not isinstance(pattern, str):
+        return None
+    if matcher.flags & ~(re.IGNORECASE | re.DOTALL | re.UNICODE):
+        return None
+
+    start = pattern.startswith("^")
+    if start:
+        pattern = pattern[1:]
+
+    chars: List[str] = []
+    end = False
+    escaped = False
+    for c in pattern:
+        if end:
+            return None
+        if escaped:
+            # escaped letters and digits are classes (\d) or references (\1)
+            if c.isalnum() or c == "_":
+                return None
+            chars.append(c)
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif c in _special and c != "$":
+            return None
+        elif c == "$":
+            end = True
+        else:
+            chars.append(c)
+
+    if escaped:
+        return None
+
+    literal = "".join(chars)
+    ignore_case = bool(matcher.flags & re.IGNORECASE)
+
+    if ignore_case:
+        # case-insensitive matching agrees with comparing casefolded strings
+        # for ascii only, others are left to the regex
+        if not literal.isascii():
+            return None
+        literal = literal.casefold()
+
+    # without the m option, $ also matches before a newline at the end
+    with_newline = literal + "\n"
+
+    if start and end:
+
+        def test(doc: str) -> bool:
+            return doc == literal or doc == with_newline
+
+    elif start:
+
+        def test(doc: str) -> bool:
+            return doc.startswith(literal)
+
+    elif end:
+
+        def test(doc: str) -> bool:
+            return doc.endswith(literal) or doc.endswith(with_newline)
+
+    else:
+
+        def test(doc: str) -> bool:
+            return literal in doc
+
+    if not ignore_case:
+        return test
+
+    def test_ignore_case(doc: str) -> bool:
+        if doc.isascii():
+            return test(doc.casefold())
+        return matcher.search(doc) is not None
+
+    return test_ignore_case
+
+
+def _regex_flags(options: str) -> int:
+    flags = re.NOFLAG
+    if "i" in options:
+        flags = flags | re.IGNORECASE
+    if "m" in options:
+        flags = flags | re.MULTILINE
+    if "s" in options:
+        flags = flags | re.DOTALL
+    if "x" in options:
+        flags = flags | re.VERBOSE
+    return flags
+
+
+def _merge_regexes(regexes: List[re.Pattern]) -> List[re.Pattern]:
+    """
+    Regexes that search a string successfully if and only if one of *regexes*
+    does, with the regexes sharing the same flags merged into one alternation.
+    Regexes with groups, which may be referred to by number, or with the x
+    option, where a comment would swallow the end of the alternative, are
+    kept as they are, as are regexes that do not compile as an alternative
+    (e.g. with global inline flags).
+    """
+
+    merged: List[re.Pattern] = []
+    by_flags: Dict[int, List[re.Pattern]] = {}
+
+    for regex in regexes:
+        if regex.groups or regex.flags & re.VERBOSE:
+            merged.append(regex)
+        else:
+            by_flags.setdefault(regex.flags, []).append(regex)
+
+    for flags, group in by_flags.items():
+        if len(group) == 1:
+            merged.extend(group)
+            continue
+
+        pattern = "|".join(f"(?:{regex.pattern})" for regex in group)
+        try:
+            merged.append(_compile_regex(pattern, flags))
+        except re.error:
+            merged.extend(group)
+
+    return merged
+
+
+# process-wide, so that queries built for a single use (and the interpreter)
+# do not recompile the same regexes
+@lru_cache(maxsize=1024)
+def _compile_regex(pattern: str, flags: int) -> re.Pattern:
+    return re.compile(pattern, flags)
+
+
+def _cost_regex(ov) -> int:
+    return 4
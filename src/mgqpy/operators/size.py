@@ -1,36 +1,62 @@
 from numbers import Number
-from typing import List
+from typing import Any, Callable, Tuple
 
+from mgqpy.path import _Path
 
-def _match_size(doc, path: List[str], ov) -> bool:
+
+def _match_size(doc, path: _Path, ov, i: int = 0) -> bool:
     if not _validate_size(ov):
         return False
 
-    if len(path) == 0:
-        if not isinstance(doc, list):
-            return False
+    if i == len(path):
+        return _leaf_size(doc, ov)
+
+    key = path.keys[i]
+
+    if isinstance(doc, dict) and key in doc:
+        return _match_size(doc[key], path, ov, i + 1)
 
-        if len(doc) == int(ov):
-            return True
+    idx = path.indices[i]
+    if isinstance(doc, list) and idx is not None and idx < len(doc):
+        return _match_size(doc[idx], path, ov, i + 1)
 
+    if isinstance(doc, list):
+        for d in doc:
+            if _match_size(d, path, ov, i):
+                return True
         return False
 
-    key = path[0]
-    rest = path[1:]
+    return False
 
-    if isinstance(doc, dict) and key in doc:
-        return _match_size(doc[key], rest, ov)
 
-    if isinstance(doc, list) and key.isdigit():
-        idx = int(key)
-        if idx < len(doc):
-            return _match_size(doc[idx], rest, ov)
+def _leaf_size(doc, ov) -> bool:
+    if not isinstance(doc, list):
+        return False
 
-    if isinstance(doc, list):
-        return any([_match_size(d, path, ov) for d in doc])
+    if len(doc) == int(ov):
+        return True
 
     return False
 
 
+def _leaf_size_int(doc, size: int) -> bool:
+    """`_leaf_size` with the size converted to int when compiling."""
+    return isinstance(doc, list) and len(doc) == size
+
+
+def _prepare_size(ov) -> Tuple[Callable[[Any, Any], bool], Any]:
+    """Leaf test and operator value for a query being compiled."""
+
+    try:
+        return _leaf_size_int, int(ov)
+    except (TypeError, ValueError, OverflowError):
+        # nan, infinity and complex numbers, which the leaf test raises on
+        return _leaf_size, ov
+
+
 def _validate_size(ov) -> bool:
     return isinstance(ov, Number)
+
+
+def _cost_size(ov) -> int:
+    return 1
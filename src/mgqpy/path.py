@@ -0,0 +1,202 @@
+# Path resolution shared by the operators of an expression.
+#
+# Walking a path from a document ends in a number of terminals: values at the
+# end of the path (leaves), and points where the path is missing. Every operator
+# matches when one of the terminals satisfies it, where a leaf is tested with
+# the operator's `_leaf_*` function and a missing path matches like a null leaf.
+# Negated operators ($ne, $nin) match when no terminal satisfies the
+# non-negated operator.
+#
+# Terminals are the same for every operator on a path, so the operators of an
+# expression can all be evaluated in one walk.
+
+import sys
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class _Path:
+    """
+    A dot-separated path, parsed once.
+
+    Fields are interned strings and numeric fields also hold the array index
+    they select, so walking a document never splits, parses or slices the path:
+    matchers keep an offset into it instead.
+    """
+
+    __slots__ = ("keys", "indices")
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys: Tuple[str, ...] = tuple(sys.intern(key) for key in keys)
+        self.indices: Tuple[Optional[int], ...] = tuple(
+            int(key) if key.isdecimal() else None for key in self.keys
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __repr__(self) -> str:
+        return f"_Path({'.'.join(self.keys)!r})"
+
+    def prefix(self, n: int) -> "_Path":
+        return _Path(self.keys[:n])
+
+
+@lru_cache(maxsize=4096)
+def _compile_path(path: str) -> _Path:
+    return _Path(path.split("."))
+
+
+# (leaf test, operator value, negated)
+_Op = Tuple[Callable[[Any, Any], bool], Any, bool]
+
+
+class _PathExpression:
+    """
+    Operators on a single path, evaluated against the terminals of one walk.
+
+    The walk tracks which operators have been satisfied by some terminal as a
+    bitmask, and stops fanning out over arrays once the result is decided.
+    When the path leads through dicts only, there is a single terminal and the
+    operators are tested in order, stopping at the first failing one.
+    """
+
+    def __init__(self, path: _Path, ops: List[_Op]):
+        self.path = path
+        self.ops = ops
+        self.leaves: List[Tuple[int, Callable[[Any, Any], bool], Any]] = []
+        self.negated = 0
+        self.missing = 0
+
+        # imported here, as the operators import this module
+        from .operators.interval import _Interval
+
+        for op_leaf, op_ov, negated in ops:
+            # the range operators of an interval are tested on a single
+            # terminal together, but may be satisfied by different terminals
+            if isinstance(op_ov, _Interval):
+                parts = op_ov.bounds
+            else:
+                parts = [(op_leaf, op_ov)]
+
+            for leaf, ov in parts:
+                bit = 1 << len(self.leaves)
+                self.leaves.append((bit, leaf, ov))
+                if negated:
+                    self.negated |= bit
+                if leaf(None, ov):
+                    self.missing |= bit
+
+        self.positive = ((1 << len(self.leaves)) - 1) & ~self.negated
+        # all operators are satisfied and none can be unsatisfied anymore
+        self.complete = self.positive if not self.negated else -1
+        self.missing_result = self.result(self.missing)
+
+    def __call__(self, doc) -> bool:
+        return self.match(doc, 0)
+
+    def match(self, doc, i: int) -> bool:
+        """Match the operators against *doc* found at offset *i* of the path."""
+
+        keys = self.path.keys
+        n = len(keys)
+
+        while i < n:
+            if isinstance(doc, dict):
+                key = keys[i]
+                if key not in doc:
+                    return self.missing_result
+                doc = doc[key]
+            elif isinstance(doc, list):
+                idx = self.path.indices[i]
+                if idx is not None and idx < len(doc):
+                    doc = doc[idx]
+                else:
+                    return self.result(self.walk(doc, i, 0))
+            else:
+                return self.missing_result
+            i += 1
+
+        for leaf, ov, negated in self.ops:
+            if bool(leaf(doc, ov)) is negated:
+                return False
+        return True
+
+    def result(self, matched: int) -> bool:
+        return matched & self.positive == self.positive and not matched & self.negated
+
+    def walk(self, doc, i: int, matched: int) -> int:
+        path = self.path
+
+        if i == len(path):
+            for bit, leaf, ov in self.leaves:
+                if not matched & bit and leaf(doc, ov):
+                    matched |= bit
+            return matched
+
+        key = path.keys[i]
+
+        if isinstance(doc, dict) and key in doc:
+            return self.walk(doc[key], i + 1, matched)
+
+        idx = path.indices[i]
+        if isinstance(doc, list) and idx is not None and idx < len(doc):
+            return self.walk(doc[idx], i + 1, matched)
+
+        if isinstance(doc, list):
+            for d in doc:
+                matched = self.walk(d, i, matched)
+                if matched & self.negated or matched == self.complete:
+                    break
+            return matched
+
+        return matched | self.missing
+
+
+class _PathGroup:
+    """
+    Path predicates sharing a common path prefix, combined as a conjunction or
+    disjunction (optionally negated).
+
+    The prefix is looked up once, after which every member continues its own
+    walk from where the lookup stopped. The lookup stops at the end of the
+    prefix, or where the document is not a dict (or a list with the indexed
+    element), in which case each member fans out over arrays or treats the
+    path as missing on its own, exactly as it would from the root.
+    """
+
+    def __init__(self, path: _Path, members: list, any_: bool, negated=False):
+        self.path = path
+        self.members = members
+        self.any = any_
+        self.negated = negated
+
+    def __call__(self, doc) -> bool:
+        return self.match(doc, 0)
+
+    def match(self, doc, i: int) -> bool:
+        """Match the members against *doc* found at offset *i* of the prefix."""
+
+        keys = self.path.keys
+        n = len(keys)
+
+        while i < n:
+            if isinstance(doc, dict):
+                key = keys[i]
+                if key not in doc:
+                    break
+                doc = doc[key]
+            elif isinstance(doc, list):
+                idx = self.path.indices[i]
+                if idx is None or idx >= len(doc):
+                    break
+                doc = doc[idx]
+            else:
+                break
+            i += 1
+
+        decides = self.any
+        for member in self.members:
+            if bool(member.match(doc, i)) is decides:
+                return decides is not self.negated
+        return decides is self.negated
@@ -0,0 +1,170 @@
+# Prepared queries: query templates with placeholders for operator values,
+# generated once (see mgqpy.codegen) and bound to values many times.
+#
+# Each placeholder is tested with a leaf test and value looked up by name in
+# the namespace of the generated predicate. Binding values prepares them like
+# the compiler would ($in values hashed into a set, strings coerced to the
+# type of a date, ...) and runs the same code object with these names bound,
+# so the structure of the query is not walked or generated again.
+
+import types
+from typing import Any, Dict, FrozenSet, Sequence, Set
+
+import mgqpy
+
+from .codegen import _exec, _Generator, _Placeholder
+from .compiler import Predicate, _Compiler, _invalid, _validators
+from .operators.all import _is_all_elem_match
+from .path import _PathExpression
+
+# operators whose value can be a placeholder, besides a whole condition value
+_bindable = {
+    "$eq",
+    "$ne",
+    "$gt",
+    "$gte",
+    "$lt",
+    "$lte",
+    "$in",
+    "$nin",
+    "$mod",
+    "$all",
+    "$size",
+}
+
+
+class Param:
+    """Placeholder for an operator value of a `PreparedQuery`, bound by name."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"Param({self.name!r})"
+
+
+class PreparedQuery:
+    """
+    A query template with `Param` placeholders, compiled once.
+
+    Placeholders can be the value of a condition or of $eq, $ne, $gt, $gte,
+    $lt, $lte, $in, $nin, $mod, $all and $size, within $not, $and, $or and
+    $nor too. `bind` returns a predicate for values of the placeholders.
+    """
+
+    def __init__(self, template, *, reorder: bool = True, strict: bool = False):
+        # every parameter of the template, including those of expressions that
+        # are generated as False and never bound
+        params: Set[str] = set()
+        _check_query(template, params)
+
+        self.template = template
+        gen = _Generator(reorder=reorder, strict=strict)
+        self.source: str = gen.function(template)
+        predicate = _exec(self.source, gen.consts)
+
+        self.params: FrozenSet[str] = frozenset(params)
+        self._code = predicate.__code__
+        self._namespace = predicate.__globals__
+        self._placeholders = gen.placeholders
+        self._expressions = gen.expressions
+        self._compiler = _Compiler(reorder=reorder, strict=strict)
+
+    def bind(self, **params) -> Predicate:
+        """
+        Predicate of the template with each placeholder bound to the value of
+        the same name. Values are validated like `Query.validate` does and
+        raise TypeError if invalid. Values bound to a whole condition are
+        always compared for equality, even dicts of operators.
+        """
+
+        missing = self.params - params.keys()
+        if missing:
+            raise TypeError(f"missing values for {', '.join(sorted(missing))}")
+        unknown = params.keys() - self.params
+        if unknown:
+            raise TypeError(f"unknown parameters {', '.join(sorted(unknown))}")
+
+        bound: Dict[str, Any] = {}
+        for i, (op, param) in enumerate(self._placeholders):
+            bound[f"_t{i}"], bound[f"_p{i}"] = self._prepare(op, params[param.name])
+
+        for name, path, ops in self._expressions:
+            bound[name] = _PathExpression(
+                path,
+                [
+                    (
+                        (bound[ov.leaf], bound[ov.value], negated)
+                        if isinstance(ov, _Placeholder)
+                        else (leaf, ov, negated)
+                    )
+                    for leaf, ov, negated in ops
+                ],
+            )
+
+        return types.FunctionType(self._code, {**self._namespace, **bound})
+
+    def _prepare(self, op: str, value):
+        if op in _validators and not _validators[op](value):
+            raise TypeError(_invalid[op])
+        if op == "$all" and not value:
+            return _leaf_never, value
+        if op == "$all" and _is_all_elem_match(value):
+            raise TypeError("$all of $elemMatch cannot be bound to a parameter")
+
+        leaf, ov, _ = self._compiler.path_op(op, value)
+        return leaf, ov
+
+
+def _leaf_never(doc, ov) -> bool:
+    # $all without values never matches
+    return False
+
+
+def _check_query(query, params: Set[str]):
+    # queries that are not dicts are left to the interpreter
+    if not isinstance(query, dict) or not all(isinstance(p, str) for p in query):
+        _check_value(query)
+        return
+
+    for path, value in query.items():
+        if path in mgqpy.query_ops and isinstance(value, list):
+            for cond in value:
+                _check_query(cond, params)
+        elif path in mgqpy.query_ops:
+            _check_value(value)
+        elif isinstance(value, Param):
+            params.add(value.name)
+        else:
+            _check_exp_or_ov(value, params)
+
+
+def _check_exp_or_ov(exp_or_ov, params: Set[str]):
+    if not mgqpy._check_all_exp(exp_or_ov):
+        _check_value(exp_or_ov)
+        return
+
+    for op, ov in exp_or_ov.items():
+        if op == "$not" and not isinstance(ov, Param):
+            _check_exp_or_ov(ov, params)
+        elif op in _bindable and isinstance(ov, Param):
+            params.add(ov.name)
+        else:
+            _check_value(ov)
+
+
+def _check_value(value):
+    if isinstance(value, Param):
+        raise TypeError(f"{value!r} cannot be used here, only as an operator value")
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _check_value(k)
+            _check_value(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _check_value(v)
+
+
+__all__: Sequence[str] = ("Param", "PreparedQuery")
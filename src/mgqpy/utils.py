@@ -3,7 +3,8 @@
 import datetime
 import decimal
 import uuid
-from typing import Any, Sequence
+from functools import lru_cache
+from typing import Any, Callable, Optional, Sequence
 
 
 def coerce(a: Any, b: Any) -> tuple[Any, Any]:
@@ -43,21 +44,106 @@ def coerce(a: Any, b: Any) -> tuple[Any, Any]:
             return a, b
 
 
+class _Coerced:
+    """
+    An operator value converted once to every type `coerce` may convert it to
+    for a document value, so that only the document side is converted at
+    match time (see `_coerce_doc`).
+    """
+
+    __slots__ = ("value", "datetime", "naive", "date", "decimal", "uuid", "from_str")
+
+    def __init__(self, value):
+        self.value = value
+
+        # the value compared to a document value of each type
+        self.datetime = self.date = value
+        if isinstance(value, str):
+            self.datetime = _try_date(value, datetime.datetime)
+            self.date = _try_date(value, datetime.date)
+        # a naive datetime takes the time zone of the document's
+        self.naive = (
+            isinstance(self.datetime, datetime.datetime)
+            and self.datetime.tzinfo is None
+            and isinstance(value, str)
+        )
+        self.decimal = _try_decimal(value)
+        self.uuid = _try_uuid(value)
+
+        # conversion of a document string compared to the value
+        self.from_str: Optional[Callable[[str], Any]] = None
+        if isinstance(value, datetime.datetime):
+            tzinfo = value.tzinfo
+            self.from_str = lambda s: _try_date(s, datetime.datetime, tzinfo=tzinfo)
+        elif isinstance(value, datetime.date):
+            self.from_str = lambda s: _try_date(s, datetime.date)
+        elif isinstance(value, decimal.Decimal):
+            self.from_str = _try_decimal
+        elif isinstance(value, uuid.UUID):
+            self.from_str = _try_uuid
+
+
+def _is_coercible(value) -> bool:
+    """Whether `coerce` may convert *value* or a document value compared to it."""
+    return type(value) is not bool and isinstance(
+        value, (str, int, float, datetime.date, decimal.Decimal, uuid.UUID)
+    )
+
+
+def _coerce_doc(doc, c: _Coerced) -> tuple[Any, Any]:
+    """`coerce(doc, c.value)`, dispatched on the type of *doc*."""
+
+    convert = _doc_coercers.get(type(doc))
+    if convert is None:
+        # subclasses and other types take the general rules
+        return coerce(doc, c.value)
+    return convert(doc, c)
+
+
+def _coerce_datetime(doc: datetime.datetime, c: _Coerced):
+    if c.naive and doc.tzinfo is not None:
+        return doc, c.datetime.replace(tzinfo=doc.tzinfo)
+    return doc, c.datetime
+
+
+def _coerce_str(doc: str, c: _Coerced):
+    if c.from_str is None:
+        return doc, c.value
+    return c.from_str(doc), c.value
+
+
+def _coerce_number(doc, c: _Coerced):
+    if isinstance(c.value, decimal.Decimal):
+        return _try_decimal(doc), c.value
+    return doc, c.value
+
+
+def _coerce_nothing(doc, c: _Coerced):
+    return doc, c.value
+
+
+_doc_coercers: dict[type, Callable[[Any, _Coerced], tuple[Any, Any]]] = {
+    datetime.datetime: _coerce_datetime,
+    datetime.date: lambda doc, c: (doc, c.date),
+    decimal.Decimal: lambda doc, c: (doc, c.decimal),
+    uuid.UUID: lambda doc, c: (doc, c.uuid),
+    str: _coerce_str,
+    int: _coerce_number,
+    float: _coerce_number,
+    bool: _coerce_nothing,
+    type(None): _coerce_nothing,
+    list: _coerce_nothing,
+    dict: _coerce_nothing,
+}
+
+
 # Datetime ↔︎ ISO 8601 string
 def _try_date(s: str, target, *, tzinfo: datetime.tzinfo | None = None):
     """Attempt to convert *val* to target date or datetime"""
-    try:
-        if target is datetime.date:
-            return datetime.date.fromisoformat(s)
-        dt = datetime.datetime.fromisoformat(s)
-        if tzinfo is not None and dt.tzinfo is None:
-            return dt.replace(tzinfo=tzinfo)
-        return dt
-    except ValueError:
-        # Not a valid ISO format – leave as string so normal
-        # comparison semantics apply (and tests expecting a failure
-        # still pass).
-        return s
+    dt = _from_str(s, target)
+    if tzinfo is not None and isinstance(dt, datetime.datetime) and dt.tzinfo is None:
+        return dt.replace(tzinfo=tzinfo)
+    return dt
 
 
 # UUID ↔︎ string
@@ -66,10 +152,7 @@ def _try_uuid(val: object):
     if isinstance(val, uuid.UUID):
         return val
     if isinstance(val, str):
-        try:
-            return uuid.UUID(val)
-        except ValueError:
-            return val
+        return _from_str(val, uuid.UUID)
     return val
 
 
@@ -78,7 +161,9 @@ def _try_decimal(val: object):
     """Attempt to convert *val* to Decimal"""
     if isinstance(val, decimal.Decimal):
         return val
-    if isinstance(val, (int, float, str)) and not isinstance(val, bool):
+    if isinstance(val, str):
+        return _from_str(val, decimal.Decimal)
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
         try:
             return decimal.Decimal(str(val))
         except (decimal.InvalidOperation, ValueError):
@@ -86,4 +171,51 @@ def _try_decimal(val: object):
     return val
 
 
-__all__: Sequence[str] = ("coerce",)
+# String conversions, memoized by `cache_coercions`
+def _convert(s: str, target):
+    """*s* converted to *target*, or *s* itself if it is not a valid value."""
+    try:
+        if target is decimal.Decimal:
+            return decimal.Decimal(str(s))
+        if target is uuid.UUID:
+            return uuid.UUID(s)
+        return target.fromisoformat(s)
+    except (decimal.InvalidOperation, ValueError):
+        # Not a valid value – leave as string so normal comparison
+        # semantics apply (and tests expecting a failure still pass).
+        return s
+
+
+_memo: Optional[Callable[[str, type], Any]] = None
+
+
+def _from_str(s: str, target):
+    # subclasses of str are not memoized, as a cache hit could return an
+    # unconverted string of another type
+    if _memo is not None and type(s) is str:
+        return _memo(s, target)
+    return _convert(s, target)
+
+
+def cache_coercions(maxsize: int = 1024) -> None:
+    """Cache the conversion of strings to datetime, date, UUID and Decimal.
+
+    Conversions are kept in a least-recently-used cache of *maxsize*
+    entries, replacing the current cache.  Pass 0 to disable it again (the
+    default).  Worth it when documents repeat the same strings, e.g.
+    timestamps or IDs from JSON compared to `datetime` or `UUID` values.
+    """
+
+    global _memo
+    _memo = lru_cache(maxsize=maxsize)(_convert) if maxsize else None
+
+
+def coercion_cache_info():
+    """Hits, misses and size of the `cache_coercions` cache, None if disabled."""
+
+    if _memo is None:
+        return None
+    return _memo.cache_info()
+
+
+__all__: Sequence[str] = ("coerce", "cache_coercions", "coercion_cache_info")
@@ -1,6 +1,8 @@
 from pymongo import MongoClient
 import pytest
 
+import mgqpy
+
 
 @pytest.fixture
 def test_db():
@@ -9,3 +11,18 @@ def test_db():
     collection = db.test_collection
     yield collection
     collection.drop()
+
+
+@pytest.fixture(params=[False, True], ids=["compiled", "codegen"])
+def codegen(request):
+    return request.param
+
+
+@pytest.fixture
+def no_interpreter(monkeypatch):
+    """Fail the test when a query is deferred to the interpreter."""
+
+    def interpret(query, doc):
+        raise AssertionError("interpreted")
+
+    monkeypatch.setattr(mgqpy, "_match_cond", interpret)
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+import mgqpy
+from mgqpy import Query
+
+from .test_compile import testcases
+
+
+@pytest.fixture
+def adapt_every(monkeypatch):
+    monkeypatch.setattr(mgqpy.compiler, "_adapt_every", 10)
+
+
+def test_adaptive_and(adapt_every):
+    q = Query({"$and": [{"a": 1}, {"b": 1}]}, adaptive=True)
+
+    for _ in range(10):
+        assert q.test({"a": 1, "b": 2}) is False
+
+    [stats] = q.stats()
+    assert stats["op"] == "$and"
+    assert stats["order"] == [0, 1]
+    assert [b["query"] for b in stats["branches"]] == [{"a": 1}, {"b": 1}]
+    assert [b["evaluated"] for b in stats["branches"]] == [10, 10]
+    assert [b["decisive"] for b in stats["branches"]] == [0, 10]
+
+    # the failing branch is moved to the front
+    assert q.test({"a": 1, "b": 2}) is False
+    [stats] = q.stats()
+    assert stats["order"] == [1, 0]
+    assert [b["evaluated"] for b in stats["branches"]] == [5, 6]
+    assert [b["decisive"] for b in stats["branches"]] == [0, 6]
+
+    assert q.test({"a": 1, "b": 1}) is True
+
+
+def test_adaptive_or(adapt_every):
+    q = Query({"$or": [{"a": 1}, {"b": 1}]}, adaptive=True)
+
+    for _ in range(11):
+        assert q.test({"a": 2, "b": 1}) is True
+
+    [stats] = q.stats()
+    assert stats["op"] == "$or"
+    assert stats["order"] == [1, 0]
+    assert [b["decisive"] for b in stats["branches"]] == [0, 6]
+
+    assert q.test({"a": 1, "b": 2}) is True
+    assert q.test({"a": 2, "b": 2}) is False
+
+
+def test_adaptive_implicit_and_and_nor(adapt_every):
+    q = Query({"a": 1, "$nor": [{"b": 1}, {"c": 1}]}, adaptive=True, normalize=False)
+
+    for _ in range(11):
+        assert q.test({"a": 1, "c": 1}) is False
+
+    [nor, implicit_and] = q.stats()
+    assert nor["op"] == "$nor"
+    assert nor["order"] == [1, 0]
+    assert implicit_and["op"] == "$and"
+    assert [b["query"] for b in implicit_and["branches"]] == [
+        {"a": 1},
+        {"$nor": [{"b": 1}, {"c": 1}]},
+    ]
+
+
+def test_adaptive_disabled():
+    assert Query({"$or": [{"a": 1}, {"b": 1}]}).stats() == []
+
+    with pytest.raises(ValueError):
+        Query({"a": 1}, codegen=True, adaptive=True)
+
+
+def test_adaptive_threads(adapt_every):
+    q = Query({"$or": [{"a": 1}, {"b": 1}, {"c": 1}]}, adaptive=True)
+    docs = [{"a": 1}, {"b": 1}, {"c": 1}, {"d": 1}] * 250
+    failures = []
+
+    def run():
+        for doc in docs:
+            if q.test(doc) is not ("d" not in doc):
+                failures.append(doc)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert failures == []
+    assert sorted(q.stats()[0]["order"]) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("name,query,docs,expected", testcases)
+def test_adaptive_keeps_results(adapt_every, name, query, docs, expected):
+    q = Query(query, adaptive=True)
+    for _ in range(3):
+        for doc in docs:
+            assert q.test(doc) is mgqpy._match_cond(query, doc), name
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 import pytest
 
 from mgqpy import Query
@@ -193,3 +195,16 @@ def test_mgqpy_invalid_query():
     assert q.test({"foo": "bar"}) is False
 
     query = {"foo": {"$all": [{"$elemMatch": {"bar": "baz"}}]}}
+
+
+def test_all_many_values(codegen):
+    tags = [f"tag{i}" for i in range(500)]
+    query = {"tags": {"$all": tags[::2] + [1, [1, 2], Decimal("2")]}}
+    q = Query(query, codegen=codegen)
+
+    assert q.test({"tags": tags + [1.0, [1, 2], 2]}) is True
+    assert q.test({"tags": tags[::-1] + [True, [1, 2], Decimal("2.0")]}) is True
+    assert q.test({"tags": tags + [[1, 2], 2]}) is False
+    assert q.test({"tags": tags[1:] + [1, [1, 2], 2]}) is False
+    assert q.test({"tags": [tags + [1, [1, 2], 2]]}) is False
+    assert q.test({"tags": "tag0"}) is False
@@ -0,0 +1,63 @@
+import tracemalloc
+
+import pytest
+
+from mgqpy import Query
+
+
+def make_doc(n):
+    return {
+        "tags": list(range(n)),
+        "items": [
+            {"price": i, "name": f"item{i}", "tags": ["a", "b"]} for i in range(n)
+        ],
+    }
+
+
+small = make_doc(300)
+large = make_doc(3000)
+
+# no element matches, so arrays are fanned out fully
+queries = [
+    ("$eq", {"tags": -1}),
+    ("$ne", {"items.price": {"$ne": -1}}),
+    ("$gte/$lt", {"items.price": {"$gte": 5000, "$lt": 6000}}),
+    ("$in", {"tags": {"$in": [-1, -2]}}),
+    ("$nin", {"items.name": {"$nin": ["a", "b"]}}),
+    ("$regex", {"items.name": {"$regex": "^other"}}),
+    ("$mod", {"items.price": {"$mod": [7000, 6999]}}),
+    ("$all", {"tags": {"$all": [0, -1]}}),
+    ("$size", {"items.tags": {"$size": 3}}),
+    ("$elemMatch", {"items": {"$elemMatch": {"price": -1}}}),
+    ("$or", {"$or": [{"items.price": -1}, {"items.name": "other"}]}),
+]
+
+# allowance for the few objects a call may create regardless of the document,
+# e.g. a regex match object
+max_bytes = 4096
+
+
+def peak_allocation(test, doc, calls=10) -> int:
+    test(doc)
+
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            test(doc)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak - start
+
+
+@pytest.mark.parametrize("name, query", queries, ids=[n for n, _ in queries])
+def test_allocations(name, query, codegen):
+    """Fanning out over arrays does not allocate per element."""
+
+    q = Query(query, codegen=codegen)
+    peak = peak_allocation(q.test, small)
+    assert peak < max_bytes, name
+    # ten times the elements, no more memory
+    assert peak_allocation(q.test, large) <= peak + 64, name
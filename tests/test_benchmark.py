@@ -0,0 +1,152 @@
+"""Per-document cost of the interpreter versus the compiled predicate.
+
+Benchmarks are disabled by default, run them with
+
+    uv run pytest tests/test_benchmark.py --benchmark-enable
+
+Each case is grouped by name so that the interpreted (before), compiled and
+generated (after) timings are reported side by side.
+"""
+
+import re
+
+import pytest
+
+import mgqpy
+from mgqpy import Query
+from mgqpy.operators.gt import _match_gt
+from mgqpy.operators.gte import _match_gte
+from mgqpy.operators.lt import _match_lt
+from mgqpy.operators.lte import _match_lte
+from mgqpy.operators.regex import _match_regex
+from mgqpy.path import _compile_path
+
+doc = {
+    "status": "active",
+    "price": 42,
+    "ratio": 7.5,
+    "name": "Hello World",
+    "tags": ["alpha", "beta", "gamma", "delta"],
+    "sizes": [3, 6, 9, 12],
+    "meta": {"owner": {"id": 7, "name": "ann"}, "created": "2024-08-01"},
+    "lines": [
+        {"sku": "a-1", "qty": 1, "price": 10},
+        {"sku": "b-2", "qty": 5, "price": 20},
+        {"sku": "c-3", "qty": 2, "price": 30},
+    ],
+}
+
+cases = [
+    ("$all", {"tags": {"$all": ["beta", "delta"]}}),
+    ("$all $elemMatch", {"lines": {"$all": [{"$elemMatch": {"qty": {"$gt": 4}}}]}}),
+    ("$and", {"$and": [{"status": "active"}, {"price": {"$gt": 10}}]}),
+    ("$or", {"$or": [{"status": "deleted"}, {"price": {"$gt": 10}}]}),
+    ("$nor", {"$nor": [{"status": "deleted"}, {"price": {"$lt": 10}}]}),
+    ("$elemMatch", {"lines": {"$elemMatch": {"sku": "b-2", "qty": {"$gte": 5}}}}),
+    ("$eq", {"meta.owner.id": 7}),
+    ("$eq array", {"lines.sku": "c-3"}),
+    ("$ne", {"status": {"$ne": "deleted"}}),
+    ("$not", {"price": {"$not": {"$lt": 10}}}),
+    ("$gt", {"price": {"$gt": 10}}),
+    ("$gte", {"ratio": {"$gte": 7.5}}),
+    ("$lt", {"lines.price": {"$lt": 15}}),
+    ("$lte", {"meta.owner.id": {"$lte": 7}}),
+    ("$in", {"status": {"$in": ["new", "pending", "active"]}}),
+    ("$nin", {"tags": {"$nin": ["omega", "epsilon"]}}),
+    ("$mod", {"sizes": {"$mod": [4, 0]}}),
+    ("$regex", {"name": {"$regex": "world$", "$options": "i"}}),
+    ("$regex implicit", {"tags": re.compile("^del")}),
+    ("$size", {"tags": {"$size": 4}}),
+    (
+        "multiple conditions",
+        {
+            "status": "active",
+            "price": {"$gte": 10, "$lt": 100},
+            "tags": {"$in": ["beta"]},
+            "meta.owner.name": {"$regex": "^a"},
+        },
+    ),
+]
+
+
+@pytest.mark.parametrize("name,query", cases)
+def test_benchmark_interpreted(benchmark, name, query):
+    benchmark.group = name
+    actual = benchmark(mgqpy._match_cond, query, doc)
+    assert actual is Query(query).test(doc), name
+
+
+@pytest.mark.parametrize("name,query", cases)
+def test_benchmark_compiled(benchmark, name, query):
+    benchmark.group = name
+    q = Query(query)
+    actual = benchmark(q.test, doc)
+    assert actual is mgqpy._match_cond(query, doc), name
+
+
+@pytest.mark.parametrize("name,query", cases)
+def test_benchmark_codegen(benchmark, name, query):
+    benchmark.group = name
+    q = Query(query, codegen=True)
+    actual = benchmark(q.test, doc)
+    assert actual is mgqpy._match_cond(query, doc), name
+
+
+# $regex over an array of strings, the regex engine (before) versus the
+# literal fast paths (after)
+regex_doc = {"tags": [f"tag-{i}" for i in range(100)] + ["Hello World"]}
+
+regex_cases = [
+    ("$regex prefix", {"$regex": "^Hello"}),
+    ("$regex prefix i", {"$regex": "^hello", "$options": "i"}),
+    ("$regex substring", {"$regex": "lo Wo"}),
+    ("$regex substring i", {"$regex": "LO WO", "$options": "i"}),
+    ("$regex suffix", {"$regex": "World$"}),
+    ("$regex exact", {"$regex": "^Hello World$"}),
+    ("$regex pattern", {"$regex": "^H.llo"}),
+]
+
+
+@pytest.mark.parametrize("name,exp", regex_cases)
+def test_benchmark_regex_match(benchmark, name, exp):
+    benchmark.group = name
+    path = _compile_path("tags")
+    ov = {"$regex": exp["$regex"], "$options": exp.get("$options", "")}
+    actual = benchmark(_match_regex, regex_doc, path, ov)
+    assert actual is True, name
+
+
+@pytest.mark.parametrize("name,exp", regex_cases)
+def test_benchmark_regex_compiled(benchmark, name, exp):
+    benchmark.group = name
+    q = Query({"tags": exp})
+    actual = benchmark(q.test, regex_doc)
+    assert actual is True, name
+
+
+# range operators over an array of numbers, the interpreter's comparison
+# through coerce (before) versus the numeric fast path (after)
+range_doc = {"values": [i * 0.5 for i in range(100)] + [7]}
+
+range_cases = [
+    ("$gt numbers", "$gt", _match_gt, 49.5),
+    ("$gte numbers", "$gte", _match_gte, 50),
+    ("$lt numbers", "$lt", _match_lt, 0),
+    ("$lte numbers", "$lte", _match_lte, -0.5),
+]
+
+
+@pytest.mark.parametrize("name,op,match,ov", range_cases)
+def test_benchmark_range_match(benchmark, name, op, match, ov):
+    benchmark.group = name
+    path = _compile_path("values")
+    actual = benchmark(match, range_doc, path, ov)
+    assert actual is False, name
+
+
+@pytest.mark.parametrize("name,op,match,ov", range_cases)
+def test_benchmark_range_compiled(benchmark, name, op, match, ov):
+    benchmark.group = name
+    q = Query({"values": {op: ov}})
+    actual = benchmark(q.test, range_doc)
+    assert actual is False, name
@@ -0,0 +1,131 @@
+import datetime
+import decimal
+import re
+import threading
+import uuid
+
+import pytest
+
+import mgqpy
+from mgqpy import Query
+from mgqpy.cache import canonical, fingerprint
+
+
+@pytest.mark.parametrize(
+    "query,same",
+    [
+        (
+            {"a": {"$gt": 1, "$lt": 5, "$not": {"$in": [1], "$nin": [2]}}},
+            {"a": {"$not": {"$nin": [2], "$in": [1]}, "$lt": 5, "$gt": 1}},
+        ),
+        (
+            {"a": {"$elemMatch": {"b": {"$gte": 1, "$lte": 2}}}},
+            {"a": {"$elemMatch": {"b": {"$lte": 2, "$gte": 1}}}},
+        ),
+        (
+            {"$or": [{"a": {"$regex": "^a", "$options": "i"}}]},
+            {"$or": [{"a": {"$options": "i", "$regex": "^a"}}]},
+        ),
+        (
+            {"a": re.compile("^a", re.I), "b": datetime.datetime(2025, 7, 31)},
+            {"a": re.compile("^a", re.I), "b": datetime.datetime(2025, 7, 31)},
+        ),
+        (
+            {"a": decimal.Decimal("1.5"), "b": uuid.UUID(int=1)},
+            {"a": decimal.Decimal("1.5"), "b": uuid.UUID(int=1)},
+        ),
+    ],
+)
+def test_fingerprint_same(query, same):
+    assert canonical(query) == canonical(same)
+    assert fingerprint(query) == fingerprint(same)
+
+
+@pytest.mark.parametrize(
+    "query,other",
+    [
+        ({"a": 1}, {"a": 1.0}),
+        ({"a": 1}, {"a": True}),
+        ({"a": 1}, {"a": "1"}),
+        ({"a": float("nan")}, {"a": float("inf")}),
+        ({"a": [1]}, {"a": (1,)}),
+        # the order of conditions and of keys in values is kept
+        ({"a": 1, "b": 2}, {"b": 2, "a": 1}),
+        ({"a": {"x": 1, "y": 2}}, {"a": {"y": 2, "x": 1}}),
+        ({"a": re.compile("^a")}, {"a": re.compile("^a", re.I)}),
+        ({"a": {"$regex": "^a"}}, {"a": re.compile("^a")}),
+        ({"a": datetime.date(2025, 7, 31)}, {"a": datetime.datetime(2025, 7, 31)}),
+        ({"a": decimal.Decimal("1.0")}, {"a": decimal.Decimal("1.00")}),
+    ],
+)
+def test_fingerprint_different(query, other):
+    assert fingerprint(query) != fingerprint(other)
+
+
+def test_fingerprint_unsupported():
+    with pytest.raises(TypeError):
+        fingerprint({"a": object()})
+
+
+@pytest.fixture()
+def query_cache():
+    mgqpy.cache.cache_queries(2)
+    yield
+    mgqpy.cache.cache_queries()
+
+
+def test_cached(query_cache):
+    query = {"a": {"$gt": 1, "$lt": 5}}
+    q = Query.cached(query)
+    assert Query.cached({"a": {"$lt": 5, "$gt": 1}}) is q
+    assert Query.cached(query, codegen=True) is not q
+    assert q.test({"a": 2}) is True
+
+    # the cached predicate does not see later changes to the query
+    query["a"]["$gt"] = 3
+    assert Query.cached({"a": {"$gt": 1, "$lt": 5}}).test({"a": 2}) is True
+
+    Query.cached({"b": 1})
+    info = mgqpy.cache.query_cache_info()
+    assert (info.hits, info.misses, info.evictions) == (2, 3, 1)
+    assert info.currsize == info.maxsize == 2
+
+
+def test_cached_uncacheable(query_cache):
+    query = {"a": object()}
+    assert Query.cached(query) is not Query.cached(query)
+    info = mgqpy.cache.query_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 2, 0)
+
+
+def test_cached_strict(query_cache):
+    with pytest.raises(TypeError):
+        Query.cached({"a": {"$in": 1}}, strict=True)
+    assert mgqpy.cache.query_cache_info().currsize == 0
+
+
+def test_cached_disabled():
+    mgqpy.cache.cache_queries(0)
+    try:
+        assert Query.cached({"a": 1}) is not Query.cached({"a": 1})
+    finally:
+        mgqpy.cache.cache_queries()
+
+
+def test_cached_threads(query_cache):
+    queries = [{"a": {"$in": [i % 3]}} for i in range(300)]
+    results = []
+
+    def run(queries):
+        results.extend(Query.cached(q).test({"a": 1}) for q in queries)
+
+    threads = [threading.Thread(target=run, args=(queries,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 4 * 100
+    info = mgqpy.cache.query_cache_info()
+    assert info.hits + info.misses == 4 * 300
+    assert info.currsize == 2
@@ -0,0 +1,41 @@
+import pytest
+
+import mgqpy
+from mgqpy import Query
+
+from .test_compile import testcases
+
+
+@pytest.mark.parametrize("name,query,docs,expected", testcases)
+def test_codegen_matches_interpreter(name, query, docs, expected):
+    q = Query(query, codegen=True)
+    for doc in docs:
+        assert q.test(doc) is mgqpy._match_cond(query, doc), name
+
+
+def test_codegen_source():
+    q = Query({"foo.bar": {"$gt": 1}}, codegen=True)
+    assert q.source is not None
+    assert q.source.startswith("def _predicate(doc):")
+    assert "# foo.bar: {'$gt': 1}" in q.source
+    assert ".get('foo', _MISSING)" in q.source
+    assert ".get('bar', _MISSING)" in q.source
+
+    assert q.test({"foo": {"bar": 2}}) is True
+    assert q.test({"foo": [{"bar": 0}, {"bar": 2}]}) is True
+    assert q.test({"foo": {"bar": 1}}) is False
+
+    assert Query({"foo.bar": {"$gt": 1}}).source is None
+
+
+def test_codegen_defers_to_interpreter():
+    q = Query({"foo": 1, "$or": [{"foo": "bar"}, "not-a-dict"]}, codegen=True)
+    assert q.source is not None
+    assert "_match_cond(" in q.source
+    assert q.test({"foo": 2}) is False
+    with pytest.raises(TypeError):
+        q.test({"foo": 1})
+
+    q = Query(None, codegen=True)
+    with pytest.raises(TypeError):
+        q.test({"foo": "bar"})
@@ -0,0 +1,115 @@
+import pytest
+
+import mgqpy
+from mgqpy import Query
+
+from . import (
+    test_all,
+    test_and,
+    test_elem_match,
+    test_eq,
+    test_gt,
+    test_gte,
+    test_in,
+    test_lt,
+    test_lte,
+    test_mod,
+    test_ne,
+    test_nin,
+    test_nor,
+    test_not,
+    test_or,
+    test_regex,
+    test_size,
+)
+
+testcases = [
+    case
+    for module in (
+        test_all,
+        test_and,
+        test_elem_match,
+        test_eq,
+        test_gt,
+        test_gte,
+        test_in,
+        test_lt,
+        test_lte,
+        test_mod,
+        test_ne,
+        test_nin,
+        test_nor,
+        test_not,
+        test_or,
+        test_regex,
+        test_size,
+    )
+    for case in module.testcases
+]
+
+
+@pytest.mark.parametrize("name,query,docs,expected", testcases)
+def test_compiled_matches_interpreter(name, query, docs, expected):
+    q = Query(query)
+    for doc in docs:
+        assert q.test(doc) is mgqpy._match_cond(query, doc), name
+
+
+def test_compile_after_mutation():
+    query = {"foo": 1}
+    q = Query(query)
+    assert q.test({"foo": 1}) is True
+
+    query["foo"] = 2
+    assert q.compile().test({"foo": 2}) is True
+    assert q.test({"foo": 1}) is False
+
+
+def test_uncompilable_query_defers_to_interpreter():
+    q = Query(None)
+    with pytest.raises(TypeError):
+        q.test({"foo": "bar"})
+
+    q = Query({"$and": [{"foo": "bar"}, "not-a-dict"]})
+    with pytest.raises(TypeError):
+        q.test({"foo": "bar"})
+
+
+@pytest.mark.parametrize("op", ["$gt", "$gte", "$lt", "$lte"])
+def test_range_numbers_compared_directly(monkeypatch, op):
+    def coerce_doc(doc, c):
+        raise AssertionError("coerced")
+
+    for module in ("gt", "gte", "lt", "lte"):
+        monkeypatch.setattr(f"mgqpy.operators.{module}._coerce_doc", coerce_doc)
+
+    query = {"n": {op: 2}, "f": {op: 2.5}}
+    q = Query(query)
+    docs = [{"n": n, "f": f} for n in (1, 2, 3.0) for f in (2.0, [2.5, 3], [])]
+    for doc in docs:
+        assert q.test(doc) is mgqpy._match_cond(query, doc)
+
+
+def test_range_interval():
+    # the range operators on a path are tested on a leaf as a single interval
+    pred = mgqpy.compiler._Compiler().cond("n", {"$gt": 1, "$gte": 2, "$lt": 5})
+    [(leaf, interval, _)] = pred.ops
+    assert (interval.lower, interval.lower_inclusive) == (2, True)
+    assert (interval.upper, interval.upper_inclusive) == (5, False)
+    # but the walk still has a bit per operator, satisfied by any terminal
+    assert len(pred.leaves) == 3
+
+
+def test_range_interval_matches(codegen):
+    query = {
+        "n": {"$gt": 1, "$gte": 2, "$lt": 5},
+        "a.b": {"$gte": float("-inf"), "$lte": 3},
+        "s": {"$gt": "a", "$lt": 5},
+    }
+    q = Query(query, codegen=codegen)
+
+    values = [1, 2, 5, 4.5, float("nan"), "b", True, None, [0, 6], [6, 0], [[3]], []]
+    docs = [{"n": v, "a": {"b": v}, "s": v} for v in values]
+    docs += [{"n": 3, "a": [{"b": 9}, {"b": float("-inf")}], "s": ["b", 4]}, {}]
+    for doc in docs:
+        assert q.test(doc) is mgqpy._match_cond(query, doc), doc
@@ -0,0 +1,76 @@
+from functools import wraps
+
+import pytest
+
+import mgqpy
+from mgqpy import Query
+from mgqpy.cost import _cost_cond, _cost_query
+
+from .test_compile import testcases
+
+
+def test_cost_model():
+    assert _cost_cond("status", "active") < _cost_cond("status", {"$ne": "active"})
+    assert _cost_cond("tags", {"$size": 2}) < _cost_cond("tags", {"$regex": "^a"})
+    assert _cost_cond("a", 1) < _cost_cond("a.b.c", 1)
+    assert _cost_cond("tags", {"$regex": "^a"}) < _cost_cond(
+        "tags", {"$elemMatch": {"name": "a"}}
+    )
+    assert _cost_cond("tags", {"$all": ["a", "b"]}) < _cost_cond(
+        "tags", {"$all": [{"$elemMatch": {"name": "a"}}]}
+    )
+    assert _cost_query({"$or": [{"a": 1}, {"b": 1}]}) > _cost_query({"a": 1})
+
+
+def test_reorder_cheap_conditions_first(monkeypatch, codegen):
+    calls = []
+
+    leaf_search = mgqpy.operators.regex._leaf_search
+
+    @wraps(leaf_search)
+    def counting(*args):
+        calls.append(args)
+        return leaf_search(*args)
+
+    monkeypatch.setattr(mgqpy.operators.regex, "_leaf_search", counting)
+    monkeypatch.setitem(mgqpy.codegen._runtime, "_leaf_search", counting)
+
+    query = {
+        "$and": [
+            {"name": {"$regex": "^a.n"}},
+            {"tags": {"$elemMatch": {"$eq": "a"}}},
+        ],
+        "status": "active",
+    }
+    # names in an array are not tested inline by generated code
+    doc = {"name": ["ann"], "tags": ["a"], "status": "deleted"}
+
+    # compiling tests how a missing field matches, only count calls at test time
+    q = Query(query, codegen=codegen)
+    calls.clear()
+    assert q.test(doc) is False
+    assert calls == []
+
+    q = Query(query, codegen=codegen, reorder=False)
+    calls.clear()
+    assert q.test(doc) is False
+    assert calls
+
+
+def test_reorder_codegen_source():
+    query = {"name": {"$regex": "^a"}, "status": "active"}
+
+    source = Query(query, codegen=True).source
+    assert source.index("# status") < source.index("# name")
+
+    source = Query(query, codegen=True, reorder=False).source
+    assert source.index("# name") < source.index("# status")
+
+
+@pytest.mark.parametrize("name,query,docs,expected", testcases)
+def test_reorder_keeps_results(name, query, docs, expected):
+    for doc in docs:
+        expected = mgqpy._match_cond(query, doc)
+        assert Query(query).test(doc) is expected, name
+        assert Query(query, reorder=False).test(doc) is expected, name
+        assert Query(query, codegen=True, reorder=False).test(doc) is expected, name
@@ -94,3 +94,17 @@ def test_mgqpy_elem_match(test_db, benchmark, name, query, input, expected):
     q = Query(query)
     actual = benchmark(get_filter_results, q.test, input)
     assert actual == expected, name
+
+
+def test_elem_match_compiled(no_interpreter, codegen):
+    queries = [
+        {"lines": {"$elemMatch": {"sku": "b-2", "qty": {"$gte": 5}}}},
+        {"lines": {"$all": [{"$elemMatch": {"qty": 5}}, {"$elemMatch": {"qty": 1}}]}},
+    ]
+    qs = [Query(query, codegen=codegen) for query in queries]
+
+    doc = {"lines": [{"sku": "a-1", "qty": 1}, {"sku": "b-2", "qty": 5}]}
+    assert [q.test(doc) for q in qs] == [True, True]
+
+    doc = {"lines": [{"sku": "a-1", "qty": 1}, {"sku": "b-2", "qty": 4}]}
+    assert [q.test(doc) for q in qs] == [False, False]
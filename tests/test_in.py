@@ -1,6 +1,12 @@
+import re
+from decimal import Decimal
+
 import pytest
 
+import mgqpy
 from mgqpy import Query
+from mgqpy.operators.eq_ne_not import _leaf_eq
+from mgqpy.operators.in_nin import _prepare_in
 
 from .helpers import get_mongo_results, get_filter_results
 
@@ -133,3 +139,62 @@ def test_mgqpy_invalid_query():
     query = {"foo": {"$in": "str"}}
     q = Query(query)
     assert q.test({"foo": "str"}) is False
+
+
+def test_in_large_list(monkeypatch, codegen):
+    ids = list(range(100_000))
+    query = {"id": {"$in": ids + ["x", None, re.compile("^y"), Decimal("-1"), [1, 2]]}}
+    q = Query(query, codegen=codegen)
+
+    calls = []
+
+    def leaf_eq(doc, ov):
+        calls.append(ov)
+        return _leaf_eq(doc, ov)
+
+    monkeypatch.setattr(mgqpy.operators.in_nin, "_leaf_eq", leaf_eq)
+
+    # only the values with special semantics are compared one by one, the
+    # Decimal and the list (others) for documents not found in the set
+    cases = [
+        ({"id": 99_999}, True, 0),
+        ({"id": 99_999.0}, True, 0),
+        ({"id": "x"}, True, 0),
+        ({"id": "yes"}, True, 0),
+        ({"id": -1}, True, 1),
+        ({"id": [0, 1]}, True, 0),
+        ({"id": [[1, 2]]}, True, 0),
+        ({}, True, 0),
+        ({"id": 100_000}, False, 2),
+        ({"id": "z"}, False, 2),
+        ({"id": [1.5, "z"]}, False, 4),
+    ]
+    for doc, expected, n in cases:
+        calls.clear()
+        assert q.test(doc) is expected, doc
+        assert len(calls) == n, doc
+
+
+def test_in_regexes_merged():
+    ov = [
+        re.compile("^a"),
+        re.compile("foo"),
+        re.compile("bar$", re.I),
+        re.compile("baz", re.I),
+        re.compile("(x)\\1"),
+        "literal",
+    ]
+    _, members = _prepare_in(ov)
+    assert len(members.regexes) == 3
+    assert members.plain == {"literal"}
+
+    q = Query({"tags": {"$in": ov}})
+    assert q.test({"tags": ["zzz", "abc"]}) is True
+    assert q.test({"tags": "a foo"}) is True
+    assert q.test({"tags": "FOOBAR"}) is True
+    assert q.test({"tags": "BAZ"}) is True
+    assert q.test({"tags": "xx"}) is True
+    assert q.test({"tags": "literal"}) is True
+    assert q.test({"tags": "Foo"}) is False
+    assert q.test({"tags": ["bar!", "x"]}) is False
+    assert q.test({"tags": 1}) is False
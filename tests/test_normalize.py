@@ -0,0 +1,194 @@
+import copy
+import re
+
+import pytest
+
+import mgqpy
+from mgqpy import Query
+
+from .test_compile import testcases
+
+
+@pytest.mark.parametrize("name,query,docs,expected", testcases)
+def test_normalized_matches_interpreter(name, query, docs, expected):
+    normalized = Query(query).normalized()
+    for doc in docs:
+        assert mgqpy._match_cond(normalized, doc) is mgqpy._match_cond(query, doc), name
+    assert list(filter(Query(query).test, docs)) == expected, name
+
+
+@pytest.mark.parametrize(
+    "query,normalized",
+    [
+        (
+            {"$and": [{"a": 1}, {"$and": [{"b": 2}, {"c": 3}]}]},
+            {"a": 1, "b": 2, "c": 3},
+        ),
+        (
+            {"$or": [{"a": 1}, {"a": 2}, {"a": {"$in": [3]}}, {"b": 1}]},
+            {"$or": [{"a": {"$in": [1, 2, 3]}}, {"b": 1}]},
+        ),
+        (
+            {"$or": [{"a": 1}, {"$or": [{"a": 2}, {"b": 1}]}]},
+            {"$or": [{"a": {"$in": [1, 2]}}, {"b": 1}]},
+        ),
+        (
+            {"$or": [{"a": 1}]},
+            {"a": 1},
+        ),
+        (
+            {"$nor": [{"a": 1}, {"a": 2}, {"b": {"$in": [1, 2]}}]},
+            {"a": {"$nin": [1, 2]}, "b": {"$nin": [1, 2]}},
+        ),
+        (
+            {"$nor": [{"a": 1}, {"b": {"$gt": 1}}]},
+            {"a": {"$ne": 1}, "$nor": [{"b": {"$gt": 1}}]},
+        ),
+        (
+            {"a": {"$not": {"$in": [1, 2]}}, "b": {"$not": {"$not": {"$gt": 1}}}},
+            {"a": {"$nin": [1, 2]}, "b": {"$gt": 1}},
+        ),
+        (
+            {"a": {"$not": {"$eq": 1}}, "b": {"$not": 2}},
+            {"a": {"$ne": 1}, "b": {"$ne": 2}},
+        ),
+        (
+            {"$and": [{"a": 1}, {"a": 1}, {"a": {"$ne": 3}}]},
+            {"a": {"$eq": 1, "$ne": 3}},
+        ),
+        (
+            {"$and": [{"a": {"$gt": 1}}, {"a": {"$gt": 2}}]},
+            {"a": {"$gt": 1}, "$and": [{"a": {"$gt": 2}}]},
+        ),
+        (
+            {"$and": [{"a": {"$regex": "^a"}}, {"a": {"$options": "i"}}]},
+            {"a": {"$regex": "^a"}},
+        ),
+        (
+            {"a": {"$eq": {"$gt": 1}}, "$and": [{"a": {"$lt": 5}}]},
+            {"a": {"$eq": {"$gt": 1}, "$lt": 5}},
+        ),
+    ],
+)
+def test_normalized(query, normalized):
+    assert Query(query).normalized() == normalized
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        # negations of an invalid $in/$nin do not swap
+        {"a": {"$not": {"$in": "bad"}}},
+        {"$nor": [{"a": {"$nin": "bad"}}]},
+        # a negated conjunction is not an atom
+        {"a": {"$not": {"$gt": 1, "$lt": 5}}},
+        {"a": {"$not": re.compile("^a")}},
+        # 1, 1.0 and True are different values
+        {"$and": [{"a": 1}, {"$and": [{"a": 1.0}, {"a": True}]}]},
+        # left to the interpreter
+        {"$and": "bad"},
+        {"$or": [{"a": 1}, "bad"]},
+        {1: 2},
+    ],
+)
+def test_normalized_keeps(query):
+    normalized = Query(query).normalized()
+    docs = [{"a": a} for a in (1, 1.0, True, "a", [1, 5], None)] + [{}]
+    for doc in docs:
+        try:
+            expected = mgqpy._match_cond(query, doc)
+        except Exception as e:
+            with pytest.raises(type(e)):
+                mgqpy._match_cond(normalized, doc)
+        else:
+            assert mgqpy._match_cond(normalized, doc) is expected
+
+
+def test_normalized_leaves_query_unchanged():
+    query = {"$and": [{"a": {"$gt": 1}}, {"a": {"$lt": 5}}], "$or": [{"b": 1}]}
+    original = copy.deepcopy(query)
+    assert Query(query).normalized() == {"a": {"$gt": 1, "$lt": 5}, "b": 1}
+    assert query == original
+
+
+def test_normalize_disabled():
+    q = Query({"$or": [{"a": 1}, {"a": 2}]}, codegen=True, normalize=False)
+    assert "$in" not in q.source
+    q = Query({"$or": [{"a": 1}, {"a": 2}]}, codegen=True)
+    assert "$in" in q.source
+
+
+@pytest.mark.parametrize(
+    "query,constant",
+    [
+        ({"a": {"$in": []}}, False),
+        ({"a": {"$all": []}, "b": 1}, False),
+        ({"a": {"$size": -1}}, False),
+        ({"a": {"$in": "bad"}}, False),
+        ({"a": {"$eq": 1, "$ne": 1}}, False),
+        (
+            {
+                "a": {"$in": [1, 2]},
+                "$and": [{"a": {"$nin": [2, 3]}}, {"a": {"$ne": 1}}],
+            },
+            False,
+        ),
+        ({"a": {"$gt": 1}, "$nor": [{"a": {"$gt": 1}}]}, False),
+        ({"a": {"$regex": "^a", "$not": {"$regex": "^a"}}}, False),
+        ({"a": {"$elemMatch": {"b": {"$in": []}}}}, False),
+        ({"$or": [{"a": {"$in": []}}, {"b": {"$size": -2}}]}, False),
+        ({"$nor": [{"a": 1}, {}]}, False),
+        ({"a": {"$not": {"$nin": []}}}, False),
+        ({"a": {"$nin": []}}, True),
+        ({"$or": [{"a": {"$gt": 1}}, {"a": {"$not": {"$gt": 1}}}]}, True),
+        ({"$or": [{"a": 1}, {"a": {"$ne": 1}}]}, True),
+        ({"$nor": [{"a": {"$in": []}}]}, True),
+        ({"a": {"$not": {"$in": [], "$gt": 1}}}, True),
+        # operators on the same path may be matched by different array elements
+        ({"a": {"$gt": 50, "$lt": 10}}, None),
+        ({"a": 1, "$and": [{"a": 2}]}, None),
+        ({"a": {"$in": [1, 2], "$ne": 1}}, None),
+        ({"a": {"$size": 1}, "$and": [{"a": {"$size": 2}}]}, None),
+    ],
+)
+def test_folded(query, constant):
+    q = Query(query)
+    assert q.constant() is constant
+    assert bool(q.folded()) is (constant is not None)
+    assert all(set(fold) == {"query", "result", "reason"} for fold in q.folded())
+
+    docs = [{"a": a} for a in (1, 2, "a", [1, 2], [60, 5], [[1], [1, 2]], None)]
+    for doc in docs + [{}, {"a": [{"b": 1}]}]:
+        expected = mgqpy._match_cond(query, doc)
+        assert constant is None or expected is constant
+        assert q.test(doc) is expected
+        assert Query(query, codegen=True).test(doc) is expected
+
+
+def test_folded_without_document():
+    # a constant query does not look at the document at all
+    for codegen in (False, True):
+        assert Query({"a": {"$in": []}}, codegen=codegen).test(object()) is False
+        assert Query({"a": {"$nin": []}}, codegen=codegen).test(object()) is True
+
+
+def test_folded_reasons():
+    q = Query({"a": {"$eq": 1, "$ne": 1}, "b": {"$nin": []}})
+    assert q.constant() is False
+    assert q.folded() == [
+        {
+            "query": {"b": {"$nin": []}},
+            "result": True,
+            "reason": "$nin without values always matches",
+        },
+        {
+            "query": {"a": {"$eq": 1, "$ne": 1}},
+            "result": False,
+            "reason": "all values are excluded by $ne or $nin",
+        },
+    ]
+    assert q.normalized() == {"$or": []}
+
+    q = Query({"a": {"$eq": 1, "$ne": 1}}, normalize=False)
+    assert q.constant() is None
+    assert q.folded() == []
@@ -1,3 +1,5 @@
+import re
+
 import pytest
 
 from mgqpy import Query
@@ -56,3 +58,17 @@ def test_mgqpy_not(test_db, benchmark, name, query, input, expected):
     q = Query(query)
     actual = benchmark(get_filter_results, q.test, input)
     assert actual == expected, name
+
+
+def test_not_compiled(no_interpreter, codegen):
+    queries = [
+        {"tags": {"$not": {"$regex": "^a"}}},
+        {"tags": {"$not": {"$in": ["a", "b"]}}},
+        {"tags": {"$not": re.compile("^a")}},
+        {"tags": {"$not": {"$size": 2}, "$ne": "c"}},
+    ]
+    qs = [Query(query, codegen=codegen) for query in queries]
+
+    assert [q.test({"tags": ["b", "c"]}) for q in qs] == [True, False, True, False]
+    assert [q.test({"tags": "a"}) for q in qs] == [False, False, False, True]
+    assert [q.test({}) for q in qs] == [True, True, True, True]
@@ -0,0 +1,103 @@
+from mgqpy import Query
+from mgqpy.operators.eq_ne_not import _leaf_eq
+from mgqpy.operators.gte import _leaf_gte
+from mgqpy.operators.lt import _leaf_lt
+from mgqpy.path import _compile_path, _PathExpression
+
+
+class CountingList(list):
+    """List that counts how often it is iterated."""
+
+    iterations = 0
+
+    def __iter__(self):
+        CountingList.iterations += 1
+        return super().__iter__()
+
+
+def test_single_walk_for_all_operators():
+    query = {"items.price": {"$gte": 10, "$lt": 100, "$ne": 50}}
+    doc = {"items": CountingList([{"price": 5}, {"price": 20}, {"price": 200}])}
+
+    for q in [Query(query), Query(query, codegen=True)]:
+        CountingList.iterations = 0
+        assert q.test(doc) is True
+        assert CountingList.iterations == 1
+
+
+def test_path_expression():
+    expr = _PathExpression(
+        _compile_path("a.b"),
+        [(_leaf_gte, 10, False), (_leaf_lt, 100, False), (_leaf_eq, 50, True)],
+    )
+
+    assert expr({"a": {"b": 20}}) is True
+    assert expr({"a": {"b": 50}}) is False
+    assert expr({"a": {"b": 5}}) is False
+    assert expr({"a": {"c": 20}}) is False
+
+    # every operator may be satisfied by a different element
+    assert expr({"a": [{"b": 5}, {"b": 200}]}) is True
+    assert expr({"a": {"b": [5, 200]}}) is True
+    # a negated operator must hold for every element
+    assert expr({"a": [{"b": 20}, {"b": 50}]}) is False
+    # numeric keys index into arrays
+    assert expr({"a": [{"b": 5}, {"b": 20}], "x": 1}) is True
+    second = _PathExpression(_compile_path("a.1"), [(_leaf_eq, 2, False)])
+    first = _PathExpression(_compile_path("a.0"), [(_leaf_eq, 2, False)])
+    assert second({"a": [1, 2]}) is True
+    assert first({"a": [1, 2]}) is False
+
+
+def test_compile_path():
+    path = _compile_path("a.0.b.10")
+    assert path.keys == ("a", "0", "b", "10")
+    assert path.indices == (None, 0, None, 10)
+    assert _compile_path("a.0.b.10") is path
+    assert path.prefix(2).keys == ("a", "0")
+
+
+def test_path_expression_missing():
+    ne = _PathExpression(_compile_path("a.b"), [(_leaf_eq, 1, True)])
+    assert ne({}) is True
+    assert ne({"a": [{"c": 1}, {"b": 2}]}) is True
+    assert ne({"a": [{"c": 1}, {"b": 1}]}) is False
+
+    eq_null = _PathExpression(_compile_path("a.b"), [(_leaf_eq, None, False)])
+    assert eq_null({"a": 1}) is True
+    assert eq_null({"a": [{"b": 1}, {"c": 1}]}) is True
+    assert eq_null({"a": [{"b": 1}]}) is False
+
+
+class CountingDict(dict):
+    """Dict that counts how often its fields are looked up."""
+
+    lookups = 0
+
+    def __getitem__(self, key):
+        CountingDict.lookups += 1
+        return super().__getitem__(key)
+
+
+def test_shared_prefix_looked_up_once():
+    query = {
+        "a.b.c": 1,
+        "a.b.d": {"$gt": 2},
+        "$or": [{"a.b.e.f": "x"}, {"a.b.e.g": "y"}],
+        "$nor": [{"a.b.h": 0}],
+    }
+    doc = {"a": CountingDict(b={"c": 1, "d": 3, "e": {"g": "y"}})}
+
+    q = Query(query)
+    CountingDict.lookups = 0
+    assert q.test(doc) is True
+    assert CountingDict.lookups == 1
+
+
+def test_shared_prefix_through_arrays():
+    query = {"a.b.c": 1, "a.b.d": 2}
+    assert Query(query).test({"a": [{"b": {"c": 1}}, {"b": {"d": 2}}]}) is True
+    assert Query(query).test({"a": {"b": [{"c": 1}, {"d": 2}]}}) is True
+    assert Query(query).test({"a": [{"b": {"c": 1}}, {"b": {"d": 3}}]}) is False
+    assert Query({"a.0.c": 1, "a.0.d": 2}).test({"a": [{"c": 1, "d": 2}]}) is True
+    assert Query({"a.b": None, "a.c": {"$ne": 1}}).test({"a": 1}) is True
@@ -0,0 +1,167 @@
+import datetime
+import threading
+
+import pytest
+
+import mgqpy
+from mgqpy import Param, Query
+
+from .test_compile import testcases
+
+
+def _template(query, params):
+    """The query with its bindable values replaced by parameters."""
+
+    if not isinstance(query, dict) or not all(isinstance(p, str) for p in query):
+        return query
+
+    template = {}
+    for path, value in query.items():
+        if path in mgqpy.query_ops and isinstance(value, list):
+            template[path] = [_template(cond, params) for cond in value]
+        elif path in mgqpy.query_ops:
+            template[path] = value
+        else:
+            template[path] = _exp_or_ov(value, params)
+    return template
+
+
+def _exp_or_ov(exp_or_ov, params):
+    if not mgqpy._check_all_exp(exp_or_ov):
+        # bound values are always compared for equality
+        if isinstance(exp_or_ov, dict):
+            return exp_or_ov
+        return _param(exp_or_ov, params)
+
+    exp = {}
+    for op, ov in exp_or_ov.items():
+        if op == "$not":
+            exp[op] = _exp_or_ov(ov, params)
+        elif op in mgqpy.prepared._bindable and _bindable(op, ov):
+            exp[op] = _param(ov, params)
+        else:
+            exp[op] = ov
+    return exp
+
+
+def _bindable(op, ov):
+    # invalid values raise when bound instead
+    if op in mgqpy.compiler._validators and not mgqpy.compiler._validators[op](ov):
+        return False
+    return not (op == "$all" and ov and mgqpy.operators.all._is_all_elem_match(ov))
+
+
+def _param(value, params):
+    name = f"p{len(params)}"
+    params[name] = value
+    return Param(name)
+
+
+@pytest.mark.parametrize("name,query,docs,expected", testcases)
+def test_bound_matches_interpreter(name, query, docs, expected):
+    params = {}
+    prepared = Query.prepare(_template(query, params))
+    assert prepared.params == params.keys()
+
+    predicate = prepared.bind(**params)
+    for doc in docs:
+        assert predicate(doc) is mgqpy._match_cond(query, doc), name
+
+
+def test_bind():
+    prepared = Query.prepare(
+        {
+            "a": {"$gte": Param("low"), "$lt": Param("high")},
+            "b": {"$in": Param("b")},
+            "$or": [{"c": Param("c")}, {"c": {"$not": {"$size": Param("size")}}}],
+        }
+    )
+    assert prepared.params == {"low", "high", "b", "c", "size"}
+
+    small = prepared.bind(low=1, high=5, b=["x", "y"], c=None, size=0)
+    large = prepared.bind(low=5, high=10, b=["z"], c=None, size=0)
+
+    doc = {"a": 2, "b": "x", "c": [1]}
+    assert small(doc) is True
+    assert large(doc) is False
+    assert large({"a": [2, 7], "b": ["y", "z"]}) is True
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        {"a": {"$all": [], "$gt": Param("x")}},
+        {"a": {"$in": 5, "$gt": Param("x")}},
+    ],
+)
+def test_bind_never_matching_expression(template):
+    # the expression is generated as False, its parameters can still be bound
+    prepared = Query.prepare(template)
+    assert prepared.params == {"x"}
+    assert prepared.bind(x=1)({"a": 2}) is False
+
+
+def test_bind_prepares_values():
+    prepared = Query.prepare({"a": {"$in": Param("a")}, "t": {"$gte": Param("t")}})
+    predicate = prepared.bind(
+        a=list(range(100)),
+        t=datetime.datetime(2025, 7, 31, tzinfo=datetime.timezone.utc),
+    )
+
+    # $in values are hashed and strings coerced to dates, as when compiled
+    _, leaf, ov = predicate.__globals__["_e0"].leaves[0]
+    assert leaf is mgqpy.operators.in_nin._leaf_in_set
+    assert predicate({"a": 99, "t": "2025-08-01T00:00:00+00:00"}) is True
+    assert predicate({"a": 99, "t": "2025-07-30T00:00:00+00:00"}) is False
+
+
+@pytest.mark.parametrize(
+    "template,params",
+    [
+        ({"a": {"$in": Param("a")}}, dict(a=1)),
+        ({"a": {"$mod": Param("a")}}, dict(a=[1])),
+        ({"a": {"$size": Param("a")}}, dict(a="1")),
+        ({"a": {"$all": Param("a")}}, dict(a=[{"$elemMatch": {"b": 1}}])),
+        ({"a": Param("a")}, dict()),
+        ({"a": Param("a")}, dict(a=1, b=2)),
+    ],
+)
+def test_bind_invalid(template, params):
+    with pytest.raises(TypeError):
+        Query.prepare(template).bind(**params)
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        {"a": {"$not": Param("a")}},
+        {"a": {"$regex": Param("a")}},
+        {"a": {"$elemMatch": {"b": Param("b")}}},
+        {"a": {"$in": [Param("a")]}},
+        {"a": {"b": Param("b")}},
+        {"$and": Param("a")},
+        {1: Param("a")},
+    ],
+)
+def test_prepare_unsupported(template):
+    with pytest.raises(TypeError):
+        Query.prepare(template)
+
+
+def test_bind_threads():
+    prepared = Query.prepare({"a": {"$in": Param("a")}})
+    docs = [{"a": i} for i in range(100)]
+    results = {}
+
+    def run(i):
+        predicate = prepared.bind(a=[i])
+        results[i] = [predicate(doc) for doc in docs for _ in range(10)]
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i, matched in results.items():
+        assert matched == [doc["a"] == i for doc in docs for _ in range(10)]
@@ -16,6 +16,7 @@ import uuid as _uuid
 
 import pytest
 
+import mgqpy.utils
 from mgqpy import Query
 
 
@@ -173,3 +174,58 @@ def test_decimal_coercion(doc, query, expected):
 )
 def test_uuid_coercion(doc, query, expected):
     assert Query(query).test(doc) is expected
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ({"ts": {"$gte": "2025-07-31"}}, 24),
+        ({"ts": "2025-07-31"}, 1),
+        ({"ts": {"$in": ["2025-07-31", "2025-08-01"]}}, 1),
+    ],
+)
+def test_query_value_coerced_once(monkeypatch, codegen, query, expected):
+    calls = []
+    try_date = mgqpy.utils._try_date
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return try_date(*args, **kwargs)
+
+    monkeypatch.setattr(mgqpy.utils, "_try_date", counting)
+
+    # the query string is parsed when compiling, never per document
+    q = Query(query, codegen=codegen)
+    calls.clear()
+
+    docs = [{"ts": _dt.datetime(2025, 7, 31, h)} for h in range(24)]
+    assert sum(q.test(doc) for doc in docs) == expected
+    assert calls == []
+
+
+@pytest.fixture()
+def coercion_cache():
+    mgqpy.utils.cache_coercions(2)
+    yield
+    mgqpy.utils.cache_coercions(0)
+
+
+def test_coercion_cache(coercion_cache, codegen):
+    q = Query({"ts": {"$gte": _dt.datetime(2025, 7, 31)}}, codegen=codegen)
+
+    docs = [
+        {"ts": "2025-07-31T12:00:00"},
+        {"ts": "2025-07-31T12:00:00"},
+        {"ts": "2025-07-30T12:00:00"},
+        {"ts": "not a date"},
+        {"ts": "not a date"},
+    ]
+    assert [q.test(doc) for doc in docs] == [True, True, False, False, False]
+
+    info = mgqpy.utils.coercion_cache_info()
+    assert (info.hits, info.misses) == (2, 3)
+    assert info.currsize == info.maxsize == 2
+
+
+def test_coercion_cache_disabled():
+    assert mgqpy.utils.coercion_cache_info() is None
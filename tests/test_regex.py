@@ -1,7 +1,14 @@
 import re
 import pytest
 
+import mgqpy
 from mgqpy import Query
+from mgqpy.operators.regex import (
+    _compile_regex,
+    _leaf_literal,
+    _leaf_regex,
+    _prepare_regex,
+)
 
 from .helpers import get_mongo_results, get_filter_results
 
@@ -218,3 +225,65 @@ def test_mgqpy_regex(test_db, benchmark, name, query, input, expected):
     q = Query(query)
     actual = benchmark(get_filter_results, q.test, input)
     assert actual == expected, name
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda query: lambda doc: mgqpy._match_cond(query, doc),
+        lambda query: Query(query).test,
+        lambda query: Query(query, codegen=True).test,
+    ],
+    ids=["interpreted", "compiled", "codegen"],
+)
+def test_regex_compiled_once(monkeypatch, build):
+    compiled = []
+
+    def compile(pattern, flags=0):
+        compiled.append((pattern, flags))
+        return re_compile(pattern, flags)
+
+    re_compile = re.compile
+    monkeypatch.setattr(re, "compile", compile)
+    _compile_regex.cache_clear()
+
+    match = build({"tags": {"$regex": "^ba", "$options": "i"}})
+    doc = {"tags": [f"tag{i}" for i in range(100)] + ["Bar"]}
+
+    assert match(doc) is True
+    assert match(doc) is True
+    assert compiled == [("^ba", re.IGNORECASE)]
+
+
+def test_regex_invalid():
+    # invalid regexes raise when tested against a string, like the interpreter
+    q = Query({"foo": {"$regex": "("}})
+    assert q.test({"foo": 1}) is False
+    assert q.test({"foo": [1]}) is False
+    with pytest.raises(re.error):
+        q.test({"foo": "bar"})
+
+
+@pytest.mark.parametrize(
+    "pattern,options,literal",
+    [
+        ("^abc", "", True),
+        ("abc", "", True),
+        ("abc$", "", True),
+        ("^abc$", "i", True),
+        ("^a\\.b", "s", True),
+        ("^abc", "m", False),
+        ("a b", "x", False),
+        ("^a.c", "", False),
+        ("a\\d", "", False),
+        ("^straße", "i", False),
+    ],
+)
+def test_regex_literal(pattern, options, literal):
+    ov = {"$regex": pattern, "$options": options}
+    leaf, prepared = _prepare_regex(ov)
+    assert (leaf is _leaf_literal) is literal
+
+    docs = ["abc", "ABC", "abc\n", "xabcx", "a.b", "a b", "", "straße", "STRASSE"]
+    for doc in docs + [[doc, 1] for doc in docs]:
+        assert leaf(doc, prepared) is _leaf_regex(doc, ov), doc
@@ -0,0 +1,106 @@
+from collections import Counter
+from functools import wraps
+
+import pytest
+
+import mgqpy
+from mgqpy import Query
+
+query = {
+    "status": "active",
+    "tags": {"$elemMatch": {"name": "beta"}},
+    "body": {"$gt": 1, "$lt": 5, "$regex": "^a"},
+}
+
+matchers = {
+    "$eq": "_match_eq",
+    "$gt": "_match_gt",
+    "$lt": "_match_lt",
+    "$regex": "_match_regex",
+    "$elemMatch": "_match_elem_match",
+}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Count operator invocations made by the interpreter and both backends."""
+
+    counter = Counter()
+
+    def counting(op, match):
+        @wraps(match)
+        def wrapper(*args):
+            counter[op] += 1
+            return match(*args)
+
+        return wrapper
+
+    for op, name in matchers.items():
+        monkeypatch.setattr(mgqpy, name, counting(op, getattr(mgqpy, name)))
+
+        # the backends test the leaves of a path directly
+        leaf, negated = mgqpy.compiler._path_ops[op]
+        monkeypatch.setitem(mgqpy.compiler._path_ops, op, (counting(op, leaf), negated))
+        monkeypatch.setitem(mgqpy.codegen._runtime, leaf.__name__, counting(op, leaf))
+
+        # or the leaf test returned by the operator's preparer
+        if op in mgqpy.compiler._preparers:
+            prepare = mgqpy.compiler._preparers[op]
+            monkeypatch.setitem(
+                mgqpy.compiler._preparers, op, counting_prepare(op, prepare, counting)
+            )
+
+    return counter
+
+
+def counting_prepare(op, prepare, counting):
+    def wrapper(ov):
+        leaf, ov = prepare(ov)
+        return counting(op, leaf), ov
+
+    return wrapper
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda: lambda doc: mgqpy._match_cond(query, doc),
+        lambda: Query(query).test,
+        lambda: Query(query, codegen=True).test,
+    ],
+    ids=["interpreted", "compiled", "codegen"],
+)
+def test_short_circuit_conditions(calls, build):
+    # compiling may call operators, only count calls at test time
+    match = build()
+    calls.clear()
+    doc = {"status": "deleted", "tags": [{"name": "beta"}], "body": 2}
+    assert match(doc) is False
+    assert calls["$elemMatch"] == 0
+    assert calls["$gt"] == 0
+    assert calls["$lt"] == 0
+    assert calls["$regex"] == 0
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda: lambda doc: mgqpy._match_cond(query, doc),
+        lambda: Query(query).test,
+    ],
+    ids=["interpreted", "compiled"],
+)
+def test_short_circuit_expression(monkeypatch, calls, build):
+    # count $gt and $lt as separate operators, not merged into one interval
+    # (see mgqpy.compiler._intervals) whatever their leaf tests
+    monkeypatch.setattr(mgqpy.compiler, "_ranges", set())
+
+    # compiling may call operators, only count calls at test time
+    match = build()
+    calls.clear()
+    doc = {"status": "active", "tags": [{"name": "beta"}], "body": 0}
+    assert match(doc) is False
+    assert calls["$elemMatch"] == 1
+    assert calls["$gt"] == 1
+    assert calls["$lt"] == 0
+    assert calls["$regex"] == 0
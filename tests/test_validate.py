@@ -1,5 +1,6 @@
 import pytest
 
+import mgqpy.operators
 from mgqpy import Query
 
 
@@ -120,3 +121,47 @@ def test_mgqpy_size_validation():
 
     with pytest.raises(TypeError):
         Query({"foo": {"$size": ["a", "b"]}}).validate()
+
+
+invalid_queries = [
+    {"foo": {"$in": "not-a-list"}},
+    {"foo": {"$nin": "not-a-list"}},
+    {"foo": {"$all": "not-a-list"}},
+    {"foo": {"$mod": ["a", "b"]}},
+    {"foo": {"$size": "2"}},
+    {"$and": "not-a-list"},
+    {"$or": [{"foo": "bar"}, "not-a-dict"]},
+    {"$nor": "not-a-list"},
+    {"foo": {"$not": {"$in": "not-a-list"}}},
+    {"foo": {"$elemMatch": {"bar": {"$size": "2"}}}},
+    {"$or": [{}, {"foo": {"$in": "not-a-list"}}]},
+]
+
+
+@pytest.mark.parametrize("query", invalid_queries)
+def test_mgqpy_strict(codegen, query):
+    Query(query, codegen=codegen)
+
+    with pytest.raises(TypeError):
+        Query(query, codegen=codegen, strict=True)
+
+
+def test_mgqpy_validated_once(monkeypatch, codegen):
+    query = {
+        "foo": {"$in": ["bar"], "$nin": [], "$mod": [2, 0], "$size": 1},
+        "bar": {"$all": [1, 2], "$in": "not-a-list"},
+        "$or": [{"baz": 1}, {"$and": "not-a-list"}],
+    }
+    q = Query(query, codegen=codegen)
+
+    def validate(ov):
+        raise AssertionError("validated")
+
+    for name in ("in_nin", "mod", "size", "all", "and_or_nor"):
+        module = getattr(mgqpy.operators, name)
+        for attr in dir(module):
+            if attr.startswith("_validate"):
+                monkeypatch.setattr(module, attr, validate)
+
+    assert q.test({"foo": [2], "bar": [1, 2], "baz": 1}) is False
+    assert q.test({"foo": [2]}) is False